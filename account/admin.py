@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User,OtpToken
+from .models import User,OtpToken,OutboxEmail
 
 
 
@@ -43,3 +43,11 @@ class OtpTokenAdmin(admin.ModelAdmin):
     readonly_fields = ('otp_code', 'otp_created_at', 'otp_expires_at', 'max_otp_try_expires')
 
 admin.site.register(OtpToken, OtpTokenAdmin)
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    search_fields = ('to_email', 'subject')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
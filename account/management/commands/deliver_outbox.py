@@ -0,0 +1,152 @@
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from account.models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at OUTBOX_RETRY_MAX_SECONDS."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return timedelta(seconds=delay + random.uniform(0, base))
+
+
+def queue_depth():
+    return OutboxEmail.objects.filter(status__in=['pending', 'sending']).count()
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to ``batch_size`` due emails to this worker in one short
+    transaction: they move to ``sending`` with ``next_attempt_at`` pushed to
+    the end of the lease. A worker that dies mid-batch leaves them to be
+    claimed again once the lease runs out.
+    """
+    current = now()
+    with transaction.atomic():
+        due = (
+            OutboxEmail.objects
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=current)
+            .order_by('next_attempt_at')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            # Several workers can drain the outbox side by side
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        lease_until = current + timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+        OutboxEmail.objects.filter(pk__in=[message.pk for message in batch]).update(
+            status='sending', next_attempt_at=lease_until,
+        )
+    return batch
+
+
+def record_outcome(message, error, max_attempts):
+    """Store the result of one send attempt (``error`` is None on success)."""
+    if error is None:
+        fields = {'status': 'sent', 'sent_at': now(), 'last_error': None}
+    else:
+        attempts = message.attempts + 1
+        fields = {'attempts': attempts, 'last_error': str(error)}
+        if attempts >= max_attempts:
+            fields['status'] = 'failed'
+            logger.error(f"Giving up on email {message.id} to {message.to_email}: {str(error)}")
+        else:
+            fields.update(status='pending', next_attempt_at=now() + retry_delay(attempts))
+    # Only while this worker's lease holds the row
+    OutboxEmail.objects.filter(pk=message.pk, status='sending').update(**fields)
+
+
+def deliver_batch(batch_size, max_attempts):
+    """
+    Send up to ``batch_size`` due emails over one SMTP connection.
+    Returns (sent, failed) counts for the batch. No database transaction is
+    open while talking to the mail server.
+    """
+    sent = failed = 0
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+        open_error = None
+    except Exception as e:
+        open_error = e
+
+    try:
+        for message in batch:
+            try:
+                if open_error is not None:
+                    raise open_error
+                email = EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    to=[message.to_email],
+                    connection=mail_connection,
+                )
+                if message.is_html:
+                    email.content_subtype = "html"
+                email.send()
+            except Exception as e:
+                record_outcome(message, e, max_attempts)
+                failed += 1
+            else:
+                record_outcome(message, None, max_attempts)
+                sent += 1
+    finally:
+        mail_connection.close()
+    return sent, failed
+
+
+def purge_sent(max_age_seconds=None):
+    """Delete emails sent longer than OUTBOX_SENT_RETENTION_SECONDS ago; returns how many."""
+    if max_age_seconds is None:
+        max_age_seconds = getattr(settings, 'OUTBOX_SENT_RETENTION_SECONDS', 7 * 24 * 60 * 60)
+    cutoff = now() - timedelta(seconds=max_age_seconds)
+    return OutboxEmail.objects.filter(status='sent', sent_at__lt=cutoff).delete()[0]
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox, reusing one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit.")
+        parser.add_argument('--stats', action='store_true', help="Print the queue depth and exit.")
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'OUTBOX_BATCH_SIZE', 100))
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument('--max-attempts', type=int, default=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8))
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            failed = OutboxEmail.objects.filter(status='failed').count()
+            self.stdout.write(f"pending={queue_depth()} failed={failed}")
+            return
+
+        last_purge = 0.0
+        while True:
+            if time.monotonic() - last_purge > 300:
+                purged = purge_sent()
+                if purged:
+                    self.stdout.write(f"purged={purged}")
+                last_purge = time.monotonic()
+
+            sent, failed = deliver_batch(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f"sent={sent} failed={failed} pending={queue_depth()}")
+            if options['once'] and not (sent or failed):
+                break
+            if not (sent or failed):
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,61 @@
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The token format as of this migration, kept here rather than imported from
+# account.search so later changes there can't alter the backfill
+_WORD = re.compile(r"[^\W_]+")
+
+
+def words(value):
+    return _WORD.findall((value or '').casefold())
+
+
+def tokens_for(name, email, phone_no):
+    tokens = {('name', word) for word in words(name)}
+
+    email = (email or '').casefold()
+    if email:
+        local, _, domain = email.partition('@')
+        tokens.update(('email', part) for part in (email, local, domain) if part)
+        tokens.update(('email', word) for word in words(email))
+
+    phone = re.sub(r"\D", "", phone_no or '')
+    tokens.update(('phone', phone[i:]) for i in range(max(0, len(phone) - 3) + 1))
+    return {(kind, token[:100]) for kind, token in tokens if token}
+
+
+def populate_search_tokens(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    CustomerSearchToken = apps.get_model('account', 'CustomerSearchToken')
+    batch = []
+    for user in User.objects.only('id', 'name', 'email', 'phone_no').iterator(chunk_size=2000):
+        for kind, token in tokens_for(user.name, user.email, user.phone_no):
+            batch.append(CustomerSearchToken(user_id=user.pk, kind=kind, token=token))
+        if len(batch) >= 20000:
+            CustomerSearchToken.objects.bulk_create(batch)
+            batch = []
+    CustomerSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('name', 'Name'), ('email', 'Email'), ('phone', 'Phone')], max_length=5)),
+                ('token', models.CharField(db_index=True, max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
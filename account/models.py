@@ -6,6 +6,8 @@ from django.utils.timezone import now
 import secrets
 import random
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 
 # Create your UserManager here.
@@ -150,3 +152,70 @@ class OtpToken(models.Model):
 def generate_unique_job_id():
     """Generate a unique 10-digit integer job ID."""
     return random.randint(1000000000, 9999999999)
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting for delivery. Rows are written in the same database
+    transaction as the change they announce and sent later by the
+    deliver_outbox management command, so requests never wait on SMTP.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),  # leased to a worker until next_attempt_at
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    to_email = models.EmailField(max_length=254)
+    is_html = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class CustomerSearchToken(models.Model):
+    """
+    A normalized search token of a user: a word of the name, a part of the
+    email, or a suffix of the phone digits. User search matches query terms
+    against these rows by prefix, see account/search.py.
+    """
+    KIND_CHOICES = [
+        ('name', 'Name'),
+        ('email', 'Email'),
+        ('phone', 'Phone'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="search_tokens")
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    token = models.CharField(max_length=100, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind}:{self.token} -> {self.user_id}"
+
+
+@receiver(post_save, sender=User)
+def index_user_search_tokens(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Refresh the search tokens when the name, email or phone number may have changed."""
+    if raw:
+        return
+    if update_fields is not None and not {'name', 'email', 'phone_no'} & set(update_fields):
+        return
+    from account.search import index_users
+    index_users([instance], replace=True)
@@ -2,7 +2,8 @@ from rest_framework import renderers
 import json
 from decimal import Decimal
 from uuid import UUID
-from datetime import datetime, date
+from datetime import datetime, date, time
+from django.conf import settings
 
 # class UserRenderer(renderers.JSONRenderer):
 #     charset = 'utf-8'
@@ -18,45 +19,51 @@ from datetime import datetime, date
 
 #         return response
 
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library encoder
+    orjson = None
+
+
+def _plain(obj):
+    if isinstance(obj, UUID):
+        return str(obj)
+    elif isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def _convert(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _plain(obj)
+
+
+def _decimal_to_str(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)  # Convert Decimal to string
+    return _plain(obj)
+
+
 class UserRenderer(renderers.JSONRenderer):
+    """
+    JSON in one encoding pass. UUIDs, dates and datetimes become strings and
+    Decimals become floats. Uses orjson when it is installed (and
+    ``settings.JSON_RENDERER_USE_ORJSON`` is not False). Both encoders go
+    through ``default`` for these types and write compact UTF-8, so the
+    bytes are the same either way.
+    """
     charset = 'utf-8'
+    default = staticmethod(_convert)
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        def convert(obj):
-            if isinstance(obj, UUID):
-                return str(obj)
-            elif isinstance(obj, Decimal):
-                return float(obj)
-            # 3. Handle datetime/date
-            elif isinstance(obj, (datetime, date)):
-                return obj.isoformat()
-            return obj
-
-        response = ''
-
-        if 'ErrorDetail' in str(data):
-            response = json.dumps(data, default=convert)
-        else:
-            response = json.dumps(data, default=convert)
-
-        return response.encode(self.charset)
-    
-class UserRendererWithDecimal(renderers.JSONRenderer):
-    charset = 'utf-8'
-    
-    def render(self, data, accepted_media_type=None, renderer_context=None):
-        # Custom method to handle Decimal type
-        def decimal_default(obj):
-            if isinstance(obj, Decimal):
-                return str(obj)  # Convert Decimal to string
-            raise TypeError(f"Type {obj.__class__.__name__} not serializable")
-
-        response = ''
-        
-        # Check if the response contains an 'ErrorDetail'
-        if 'ErrorDetail' in str(data):
-            response = json.dumps(data, default=decimal_default)
-        else:
-            response = json.dumps(data, default=decimal_default)
-        
-        return response
\ No newline at end of file
+        if orjson is not None and getattr(settings, 'JSON_RENDERER_USE_ORJSON', True):
+            return orjson.dumps(
+                data, default=self.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        return json.dumps(data, default=self.default, ensure_ascii=False, separators=(',', ':')).encode(self.charset)
+
+
+class UserRendererWithDecimal(UserRenderer):
+    """Like UserRenderer, but Decimals are kept exact as strings."""
+    default = staticmethod(_decimal_to_str)
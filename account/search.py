@@ -0,0 +1,144 @@
+"""
+Ranked user search over names, emails and phone numbers.
+
+Each user is indexed as ``CustomerSearchToken`` rows:
+
+* the lower-cased words of the name,
+* the whole email, its local part and domain, and their words,
+* every suffix (3 digits or longer) of the phone number's digits, so a
+  prefix lookup finds any run of digits inside the number.
+
+A query is split into terms the same way. A user matches when every term is
+a prefix of one of their tokens. Exact token matches rank above prefix
+matches. A query made only of digits and phone punctuation
+(``017 12-34``) is treated as one phone term.
+
+When no user has a token starting with the terms, the search falls back to
+``icontains`` on name, email and phone number (a scan), so text inside a
+word (``mith`` in "Smith") is still found; those results rank 0.
+"""
+import re
+from functools import reduce
+from operator import add, and_, or_
+
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+
+from account.models import CustomerSearchToken, User
+
+
+MIN_PHONE_SUFFIX = 3
+MAX_TOKEN_LENGTH = 100
+MAX_QUERY_TERMS = 6
+_WORD = re.compile(r"[^\W_]+")
+_PHONE_QUERY = re.compile(r"^[\d\s\-().+]+$")
+
+
+def words(value):
+    return _WORD.findall((value or '').casefold())
+
+
+def digits(value):
+    return re.sub(r"\D", "", value or '')
+
+
+def tokens_for(name, email, phone_no):
+    """``{(kind, token)}`` for one user."""
+    tokens = {('name', word) for word in words(name)}
+
+    email = (email or '').casefold()
+    if email:
+        local, _, domain = email.partition('@')
+        tokens.update(('email', part) for part in (email, local, domain) if part)
+        tokens.update(('email', word) for word in words(email))
+
+    phone = digits(phone_no)
+    tokens.update(('phone', phone[i:]) for i in range(max(0, len(phone) - MIN_PHONE_SUFFIX) + 1))
+    return {(kind, token[:MAX_TOKEN_LENGTH]) for kind, token in tokens if token}
+
+
+def index_users(users, replace=False):
+    """Write the search tokens of ``users``; ``replace`` drops their old tokens first."""
+    if replace:
+        CustomerSearchToken.objects.filter(user__in=[user.pk for user in users]).delete()
+    CustomerSearchToken.objects.bulk_create([
+        CustomerSearchToken(user_id=user.pk, kind=kind, token=token)
+        for user in users
+        for kind, token in tokens_for(user.name, user.email, user.phone_no)
+    ], batch_size=5000)
+
+
+def query_terms(query):
+    query = (query or '').strip()
+    if _PHONE_QUERY.match(query) and digits(query):
+        return [digits(query)]
+    return words(query)[:MAX_QUERY_TERMS]
+
+
+def search_users(queryset, query):
+    """
+    Restrict ``queryset`` to users matching ``query``, annotated with
+    ``search_rank`` and ordered by it (newest first among equal ranks).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    # One score per term: 3 for an exact token, 1 for a prefix, 0 for none
+    scores = {
+        f'term_{i}': Max(Case(
+            When(token=term, then=Value(3)),
+            When(token__startswith=term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        for i, term in enumerate(terms)
+    }
+    matches = (
+        CustomerSearchToken.objects
+        .filter(reduce(or_, [Q(token__startswith=term) for term in terms]))
+        .values('user')
+        .annotate(**scores)
+        .filter(**{f'{name}__gt': 0 for name in scores})
+        .annotate(rank=reduce(add, [F(name) for name in scores]))
+        .order_by()
+    )
+    ranked = (
+        queryset
+        .filter(pk__in=matches.values('user'))
+        .annotate(search_rank=Subquery(matches.filter(user=OuterRef('pk')).values('rank')[:1]))
+        .order_by('-search_rank', '-created_at')
+    )
+    if ranked.exists():
+        return ranked
+    return substring_matches(queryset, terms)
+
+
+def substring_matches(queryset, terms):
+    """Users with every term somewhere in their name, email or phone number."""
+    condition = reduce(and_, [
+        Q(name__icontains=term) | Q(email__icontains=term) | Q(phone_no__icontains=term)
+        for term in terms
+    ])
+    return (
+        queryset
+        .filter(condition)
+        .annotate(search_rank=Value(0, output_field=IntegerField()))
+        .order_by('-created_at')
+    )
+
+
+def rebuild(batch_size=2000):
+    """Regenerate every user's search tokens; returns the number of users indexed."""
+    CustomerSearchToken.objects.all().delete()
+    indexed = 0
+    batch = []
+    for user in User.objects.only('id', 'name', 'email', 'phone_no').iterator(chunk_size=batch_size):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            index_users(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        index_users(batch)
+        indexed += len(batch)
+    return indexed
@@ -10,7 +10,7 @@ from django.utils.encoding import smart_str,force_bytes,DjangoUnicodeDecodeError
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from decouple import config
 from django.core.exceptions import ValidationError
-from .utils import send_email,generate_password_reset_email_html
+from .utils import queue_email,generate_password_reset_email_html
 
 FRONTEND_BASE_URL = config('FRONTEND_BASE_URL')
 
@@ -151,7 +151,7 @@ class SendPasswordResetEmailSerializer(serializers.Serializer):
                 'to_email': user.email
 
             }
-            email_sent=send_email(data, is_html=True)
+            email_sent=queue_email(data, is_html=True)
             if not email_sent:
                 raise ValidationError("Failed to send password reset email. Please try again later.")
             
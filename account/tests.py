@@ -1,3 +1,157 @@
-from django.test import TestCase
+import importlib
+import json
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from account import renderers
+from account.models import OutboxEmail, User
+from account.renderers import UserRenderer, UserRendererWithDecimal
+from account.search import search_users
+from account.typeahead import PrefixIndex
+
+deliver_outbox = importlib.import_module('account.management.commands.deliver_outbox')
+
+
+class UserSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.smith = User.objects.create_user(
+            name='John Smith', email='john@example.com', phone_no='+8801712345678', password='pass12345',
+        )
+        cls.smithers = User.objects.create_user(
+            name='Wayland Smithers', email='wayland@example.com', phone_no='+8801812345678', password='pass12345',
+        )
+
+    def search(self, query):
+        return list(search_users(User.objects.all(), query))
+
+    def test_prefix_of_a_word(self):
+        self.assertEqual(self.search('smith'), [self.smith, self.smithers])
+
+    def test_text_inside_a_word_falls_back_to_substring(self):
+        results = self.search('mith')
+        self.assertEqual(set(results), {self.smith, self.smithers})
+        self.assertEqual({user.search_rank for user in results}, {0})
+
+    def test_no_match(self):
+        self.assertEqual(self.search('xyz'), [])
+
+
+class RendererTests(TestCase):
+    data = {
+        'id': uuid.UUID(int=1),
+        'name': 'Zoë',
+        'amount': Decimal('1234.50'),
+        'created_at': datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+        'day': date(2026, 1, 2),
+        'items': [{'count': 3, 'active': True, 'note': None}],
+    }
+
+    def render(self, renderer_class, use_orjson):
+        with override_settings(JSON_RENDERER_USE_ORJSON=use_orjson):
+            return renderer_class().render(self.data)
+
+    def test_stdlib_encoding(self):
+        for renderer_class, amount in ((UserRenderer, 1234.5), (UserRendererWithDecimal, '1234.50')):
+            with self.subTest(renderer=renderer_class.__name__):
+                content = self.render(renderer_class, False)
+                self.assertEqual(json.loads(content), {
+                    'id': '00000000-0000-0000-0000-000000000001',
+                    'name': 'Zoë',
+                    'amount': amount,
+                    'created_at': '2026-01-02T03:04:05.678000+00:00',
+                    'day': '2026-01-02',
+                    'items': [{'count': 3, 'active': True, 'note': None}],
+                })
+
+    @unittest.skipIf(renderers.orjson is None, "orjson is not installed")
+    def test_orjson_matches_stdlib(self):
+        for renderer_class in (UserRenderer, UserRendererWithDecimal):
+            with self.subTest(renderer=renderer_class.__name__):
+                self.assertEqual(self.render(renderer_class, True), self.render(renderer_class, False))
+
+
+class CustomerSuggestTests(TestCase):
+
+    def test_anonymous_request_is_unauthorized(self):
+        response = APIClient().get(reverse('customer-suggest'), {'q': 'al'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_shortest_token_first(self):
+        rows = [
+            (1, 'Alibaba Rahman', 'x1@example.com', None),
+            (2, 'Alice Khan', 'x2@example.com', None),
+            (3, 'Ali Hasan', 'x3@example.com', None),
+        ]
+        index = PrefixIndex.build(rows)
+        self.assertEqual([row[0] for row in index.search('ali')], [3, 2, 1])
+        self.assertEqual([row[0] for row in index.search('ali', limit=2)], [3, 2])
+        self.assertEqual([row[0] for row in index.search('ali khan')], [2])
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', OUTBOX_LEASE_SECONDS=300)
+class OutboxDeliveryTests(TestCase):
+
+    def queue(self, count=2):
+        return OutboxEmail.objects.bulk_create([
+            OutboxEmail(subject=f"Subject {i}", body="Body", to_email=f"user{i}@example.com") for i in range(count)
+        ])
+
+    def test_delivers_and_marks_sent(self):
+        self.queue()
+        self.assertEqual(deliver_outbox.deliver_batch(10, 3), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', flat=True)), {'sent'})
+
+    def test_claimed_batch_is_leased(self):
+        self.queue()
+        batch = deliver_outbox.claim_batch(10)
+
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(deliver_outbox.claim_batch(10), [])
+        self.assertTrue(all(m.next_attempt_at > now() for m in OutboxEmail.objects.filter(status='sending')))
+
+        # The worker died: the emails are claimed again once the lease runs out
+        OutboxEmail.objects.update(next_attempt_at=now() - timedelta(seconds=1))
+        self.assertEqual(len(deliver_outbox.claim_batch(10)), 2)
+
+    def test_no_transaction_is_open_while_sending(self):
+        self.queue(1)
+        outer = len(connection.atomic_blocks)
+        depth = []
+
+        def send(backend, messages):
+            depth.append(len(connection.atomic_blocks))
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send):
+            deliver_outbox.deliver_batch(10, 3)
+        # Only the blocks TestCase wraps around the test itself are open
+        self.assertEqual(depth, [outer])
+
+    def test_failed_send_is_retried_later(self):
+        self.queue(1)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError("down")):
+            self.assertEqual(deliver_outbox.deliver_batch(10, 3), (0, 1))
+        message = OutboxEmail.objects.get()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, now())
+
+    def test_purges_old_sent_emails(self):
+        old, recent, pending = self.queue(3)
+        OutboxEmail.objects.filter(pk=old.pk).update(status='sent', sent_at=now() - timedelta(days=8))
+        OutboxEmail.objects.filter(pk=recent.pk).update(status='sent', sent_at=now() - timedelta(days=1))
+
+        self.assertEqual(deliver_outbox.purge_sent(7 * 24 * 60 * 60), 1)
+        self.assertEqual(set(OutboxEmail.objects.values_list('pk', flat=True)), {recent.pk, pending.pk})
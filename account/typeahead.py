@@ -0,0 +1,211 @@
+"""
+In-memory prefix index for the customer picker (``customers/suggest/``).
+
+Every worker process keeps the active customers in a sorted list of
+``token\\x00slot`` strings; a keystroke is a ``bisect`` into that list plus a
+short scan, with no database access. Tokens are the words of the name, the
+email and its local part, and the phone digits with and without the country
+code or with a trunk ``0``. A query containing ``@`` is matched against emails
+as a whole, and one made of digits and phone punctuation against phone
+numbers. Matches come back shortest matching token first.
+
+The index is built on first use. After that, at most every
+``TYPEAHEAD_REFRESH_SECONDS`` a request pulls the customers created or
+updated since the last refresh and patches them in; a full rebuild every
+``TYPEAHEAD_REBUILD_SECONDS`` picks up anything an incremental refresh can't
+see, such as deleted rows or ``QuerySet.update()`` calls.
+"""
+import bisect
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+
+from account.models import User
+from account.search import digits, words
+
+
+SEPARATOR = '\x00'
+NATIONAL_DIGITS = 10
+MAX_SCAN = 2000
+
+
+def tokens_for(name, email, phone_no):
+    tokens = set(words(name))
+    email = (email or '').casefold()
+    if email:
+        tokens.add(email)
+        tokens.add(email.partition('@')[0])
+    phone = digits(phone_no)
+    if phone:
+        national = phone[-NATIONAL_DIGITS:]
+        # International, bare national and trunk-prefixed (0...) forms
+        tokens.update((phone, national, f"0{national}"))
+    return tokens
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over customer tokens. Not thread safe by itself."""
+
+    def __init__(self):
+        self.keys = []
+        self.users = {}       # slot -> (id, name, email, phone_no)
+        self.tokens = {}      # slot -> tokens, to remove a customer again
+        self.slots = {}       # id -> slot
+        self._next_slot = 0
+
+    def __len__(self):
+        return len(self.users)
+
+    @classmethod
+    def build(cls, rows):
+        """Build from ``(id, name, email, phone_no)`` rows in one sort."""
+        index = cls()
+        keys = []
+        for row in rows:
+            slot = index._register(row)
+            keys.extend(f"{token}{SEPARATOR}{slot}" for token in index.tokens[slot])
+        keys.sort()
+        index.keys = keys
+        return index
+
+    def _register(self, row):
+        slot = self._next_slot
+        self._next_slot += 1
+        self.users[slot] = row
+        self.tokens[slot] = tokens_for(*row[1:])
+        self.slots[row[0]] = slot
+        return slot
+
+    def remove(self, user_id):
+        slot = self.slots.pop(user_id, None)
+        if slot is None:
+            return
+        for token in self.tokens.pop(slot):
+            key = f"{token}{SEPARATOR}{slot}"
+            position = bisect.bisect_left(self.keys, key)
+            if position < len(self.keys) and self.keys[position] == key:
+                del self.keys[position]
+        del self.users[slot]
+
+    def upsert(self, row):
+        self.remove(row[0])
+        slot = self._register(row)
+        for token in self.tokens[slot]:
+            bisect.insort(self.keys, f"{token}{SEPARATOR}{slot}")
+
+    def search(self, query, limit=10):
+        """Customers having a token starting with each term, shortest tokens first."""
+        query = (query or '').strip().casefold()
+        if '@' in query:
+            terms = [query]
+        elif digits(query) and not any(char.isalpha() for char in query):
+            terms = [digits(query)]
+        else:
+            terms = words(query)
+        if not terms:
+            return []
+
+        # Scan on the longest term, check the others against the candidate's
+        # tokens, and keep each customer's shortest matching token for ranking
+        terms.sort(key=len, reverse=True)
+        lead, others = terms[0], terms[1:]
+        best = {}
+        rejected = set()
+        position = bisect.bisect_left(self.keys, lead)
+        end = min(len(self.keys), position + MAX_SCAN)
+        while position < end:
+            key = self.keys[position]
+            position += 1
+            if not key.startswith(lead):
+                break
+            token, _, slot = key.rpartition(SEPARATOR)
+            slot = int(slot)
+            if slot in rejected:
+                continue
+            if slot not in best:
+                tokens = self.tokens[slot]
+                if not all(any(t.startswith(term) for t in tokens) for term in others):
+                    rejected.add(slot)
+                    continue
+            elif (len(best[slot]), best[slot]) <= (len(token), token):
+                continue
+            best[slot] = token
+        ranked = sorted(best, key=lambda slot: (len(best[slot]), best[slot], slot))
+        return [self.users[slot] for slot in ranked[:limit]]
+
+
+class CustomerSuggester:
+    """A lazily built, periodically refreshed ``PrefixIndex`` of active customers."""
+
+    def __init__(self):
+        self._index = None
+        # Guards searches and in-place patches of the index
+        self._lock = threading.Lock()
+        # Only one thread rebuilds or refreshes at a time
+        self._refresh_lock = threading.Lock()
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._watermark = None
+
+    def _rebuild(self):
+        watermark = now()
+        rows = (
+            User.objects.filter(role='customer', is_active=True)
+            .values_list('id', 'name', 'email', 'phone_no')
+            .iterator(chunk_size=5000)
+        )
+        index = PrefixIndex.build(rows)
+        with self._lock:
+            self._index, self._watermark = index, watermark
+        self._built_at = self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        """Patch in users created or updated since the last refresh."""
+        watermark = now()
+        # Overlap a little for rows committed after their timestamp was taken
+        since = self._watermark - timedelta(seconds=getattr(settings, 'TYPEAHEAD_REFRESH_OVERLAP_SECONDS', 30))
+        changed = list(
+            User.objects.filter(Q(created_at__gte=since) | Q(updated_at__gte=since))
+            .values_list('id', 'name', 'email', 'phone_no', 'role', 'is_active')
+        )
+        with self._lock:
+            for user_id, name, email, phone_no, role, is_active in changed:
+                if role == 'customer' and is_active:
+                    self._index.upsert((user_id, name, email, phone_no))
+                else:
+                    self._index.remove(user_id)
+            self._watermark = watermark
+        self._refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self):
+        if self._index is None:
+            with self._refresh_lock:
+                if self._index is None:
+                    self._rebuild()
+            return
+
+        elapsed = time.monotonic()
+        rebuild_due = elapsed - self._built_at >= getattr(settings, 'TYPEAHEAD_REBUILD_SECONDS', 3600)
+        refresh_due = elapsed - self._refreshed_at >= getattr(settings, 'TYPEAHEAD_REFRESH_SECONDS', 5)
+        # Other threads keep answering from the current index meanwhile
+        if (rebuild_due or refresh_due) and self._refresh_lock.acquire(blocking=False):
+            try:
+                if rebuild_due:
+                    self._rebuild()
+                else:
+                    self._refresh()
+            finally:
+                self._refresh_lock.release()
+
+    def suggest(self, query, limit=10):
+        """Up to ``limit`` ``(id, name, email, phone_no)`` rows matching ``query``."""
+        self._maybe_refresh()
+        with self._lock:
+            return self._index.search(query, limit)
+
+
+suggester = CustomerSuggester()
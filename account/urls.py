@@ -13,6 +13,7 @@ urlpatterns = [
     path('rest-password/<uid>/<token>/', UserPasswordResetView.as_view(),name='rest-password'),
 
     path('user-list/', UserListView.as_view(), name='user-list'),
+    path('customers/suggest/', CustomerSuggestView.as_view(), name='customer-suggest'),
     
     path('change-active-status/', ChangeUserActiveStatusView.as_view(), name='change-active-status'),
     path('update-profile/', UpdateOwnProfileView.as_view(), name='update-own-profile'),
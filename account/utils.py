@@ -1,6 +1,6 @@
 from django.utils import timezone
 import secrets
-from .models import OtpToken
+from .models import OtpToken,OutboxEmail
 from rest_framework.exceptions import ValidationError
 from django.utils.timezone import now
 from decimal import Decimal
@@ -87,6 +87,33 @@ def send_email(data, is_html=False):
         print(str(e))
         return False
     
+def queue_email(data, is_html=False):
+    """
+    Queue an email in the outbox instead of sending it during the request.
+    Call it inside the transaction that makes the change the email is about;
+    the deliver_outbox command sends it once that transaction commits.
+
+    Args:
+        data: dict with keys 'subject', 'body', 'to_email'
+        is_html: bool, default False; if True send HTML email
+    """
+    OutboxEmail.objects.create(
+        subject=data['subject'],
+        body=data['body'],
+        to_email=data['to_email'],
+        is_html=is_html,
+    )
+    return True
+
+
+def queue_emails(messages, is_html=False):
+    """Queue several emails (dicts like queue_email's data) with one insert."""
+    OutboxEmail.objects.bulk_create([
+        OutboxEmail(subject=data['subject'], body=data['body'], to_email=data['to_email'], is_html=is_html)
+        for data in messages
+    ])
+    return True
+
 def get_display_label(value, choices):
     for key, label in choices:
         if key == value:
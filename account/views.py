@@ -8,7 +8,7 @@ from account.serializer import UserRegistrationSerializer, UserProfileSerializer
 from django.utils import timezone
 from django.db import transaction
 from django.contrib.auth import login
-from .utils import generate_unique_otp,send_email,flattened_serializer_errors,generate_otp_email_body_html
+from .utils import generate_unique_otp,queue_email,flattened_serializer_errors,generate_otp_email_body_html
 from account.models import OtpToken,User
 from rest_framework.exceptions import AuthenticationFailed,ValidationError,PermissionDenied
 from drf_yasg.utils import swagger_auto_schema
@@ -20,7 +20,8 @@ from drf_yasg import openapi
 import uuid
 from user_wallet.models import Wallet
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
+from account.search import search_users
+from account.typeahead import suggester
 
 
 
@@ -106,16 +107,12 @@ class UserListView(APIView):
                 is_verified_bool = is_verified.lower() == 'true'
                 users = users.filter(is_verified=is_verified_bool)
             
-            # Apply search filter
+            # Apply search filter, best matches first
             if search:
-                users = users.filter(
-                    Q(name__icontains=search) |
-                    Q(email__icontains=search) |
-                    Q(phone_no__icontains=search)
-                )
-            
-            # Order by creation date (newest first)
-            users = users.order_by('-created_at')
+                users = search_users(users, search)
+            else:
+                # Order by creation date (newest first)
+                users = users.order_by('-created_at')
             
             # Apply pagination
             paginator = PageNumberPagination()
@@ -150,6 +147,38 @@ class UserListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 
+class CustomerSuggestView(APIView):
+    """
+    Typeahead for the teller's customer picker, answered from the worker's
+    in-memory prefix index (see account/typeahead.py).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated,IsAuthorizedUser,IsUserVerifiedAndEnabled]
+    renderer_classes = [UserRenderer]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({
+                'success': False,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'message': 'limit must be an integer.',
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = suggester.suggest(query, limit) if query else []
+        return Response({
+            'success': True,
+            'status': status.HTTP_200_OK,
+            'message': f'{len(matches)} matching customers',
+            'data': [
+                {'id': user_id, 'name': name, 'email': email, 'phone_no': phone_no}
+                for user_id, name, email, phone_no in matches
+            ],
+        }, status=status.HTTP_200_OK)
+
+
 class UserProfileDetailView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
@@ -496,7 +525,7 @@ class ResendOtpView(APIView):
 
         }
         
-        email_sent=send_email(data,is_html=True)
+        email_sent=queue_email(data,is_html=True)
 
 
         if email_sent:
@@ -750,7 +779,7 @@ class AuthorizeUserRegistrationView(APIView):
 
                 }
 
-                email_sent=send_email(data, is_html=True)
+                email_sent=queue_email(data, is_html=True)
 
                 if email_sent:
                     return Response({
@@ -861,7 +890,7 @@ class UserRegistrationView(APIView):
 
                 }
 
-                email_sent=send_email(data,is_html=True)
+                email_sent=queue_email(data,is_html=True)
 
                 if email_sent:
                     return Response({
@@ -0,0 +1,15 @@
+# Loaded automatically by gunicorn from the working directory.
+import logging
+
+
+def post_worker_init(worker):
+    # With PDF_RENDERER_SOCKET unset this worker renders PDFs itself: parse
+    # stylesheets, load fonts and decode static images now instead of on the
+    # first PDF request it serves. With it set, nothing is checked here (the
+    # daemon may still be starting); render() finds out at the first PDF.
+    from user_wallet import pdf_renderer
+
+    try:
+        pdf_renderer.warm_local()
+    except Exception:
+        logging.getLogger(__name__).exception("PDF warm-up failed; assets will load on first use.")
@@ -120,9 +120,34 @@ EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS") == "True"
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Outbox delivery (python manage.py deliver_outbox)
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+# A claimed batch is leased to its worker this long, then re-sent if unconfirmed
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_SENT_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Cache: shared Redis in production, per-process memory otherwise
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 
 # Database
@@ -196,6 +221,73 @@ STATICFILES_DIRS = [BASE_DIR / 'static_file']
 # Add this line:
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # Destination folder for collectstatic
 
+# Generated files (statement PDFs)
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Receipt PDFs are cached on disk, least recently used evicted past the size limit
+RECEIPT_PDF_CACHE_DIR = MEDIA_ROOT / 'receipt_cache'
+RECEIPT_PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# PDF output: images are downsampled to this resolution (see build_pdf_assets)
+PDF_IMAGE_DPI = 300
+PDF_JPEG_QUALITY = 85
+# Receipt barcodes: 'svg' (inline vector) or 'png'; both cached per transaction_id
+RECEIPT_BARCODE_FORMAT = 'svg'
+BARCODE_CACHE_SIZE = 4096
+# PDF renderer daemon (python manage.py run_pdf_renderer). API workers render
+# in-process while nothing listens on the socket; '' disables the daemon.
+PDF_RENDERER_SOCKET = BASE_DIR / 'run' / 'pdf_renderer.sock'
+PDF_RENDERER_WORKERS = 2
+PDF_RENDERER_TIMEOUT_SECONDS = 60
+PDF_RENDERER_MAX_JOBS = 500
+# Admission control for the PDF endpoints: renders allowed at once per gunicorn
+# worker (matters with threaded workers) and per host (0 = no host limit).
+# Requests wait up to PDF_ADMISSION_WAIT_SECONDS for a slot, then get 503 with
+# Retry-After; keep it far below the gunicorn timeout.
+PDF_MAX_CONCURRENT_PER_WORKER = 1
+PDF_MAX_CONCURRENT_PER_HOST = 2
+PDF_ADMISSION_WAIT_SECONDS = 1
+PDF_RETRY_AFTER_SECONDS = 10
+PDF_ADMISSION_LOCK_DIR = BASE_DIR / 'run' / 'pdf_slots'
+
+
+
+# Wallet transaction IDs ("TX" + 10 base-36 chars), see user_wallet/transaction_ids.py
+TRANSACTION_ID_ALLOCATOR = 'user_wallet.transaction_ids.BlockSequenceAllocator'
+TRANSACTION_ID_BLOCK_SIZE = 1000
+BULK_TRANSACTION_MAX_ROWS = 1000
+# Rows fetched per database round trip by transactions/export/
+TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+# Background statement PDFs (python manage.py run_statement_jobs)
+# A worker refreshes its running job's heartbeat every HEARTBEAT seconds; a
+# job without one for STALE seconds is requeued (its worker died)
+STATEMENT_JOB_HEARTBEAT_SECONDS = 30
+STATEMENT_JOB_STALE_SECONDS = 3 * 60
+# Failed attempts are retried after RETRY_BACKOFF * 2 ** (attempt - 1) seconds
+STATEMENT_JOB_RETRY_BACKOFF_SECONDS = 30
+STATEMENT_JOB_MAX_ATTEMPTS = 3
+STATEMENT_JOB_TTL_SECONDS = 24 * 60 * 60
+# Statement PDFs: rows allowed from generate-statement/ and from a job, and
+# rows per separately rendered chunk (longer statements are merged with pypdf)
+STATEMENT_MAX_ROWS = 10000
+STATEMENT_JOB_MAX_ROWS = 200000
+STATEMENT_CHUNK_ROWS = 500
+# Number of striped rows holding the house (CEO) balance, see user_wallet/treasury.py
+TREASURY_STRIPES = 16
+# How long a stored Idempotency-Key response is replayed
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+# Wallet row locking, see user_wallet/locking.py
+WALLET_LOCK_TIMEOUT_SECONDS = 5
+WALLET_LOCK_RETRIES = 3
+WALLET_LOCK_BACKOFF_SECONDS = 0.05
+# Cached dashboard/wallet cards, see user_wallet/response_cache.py
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_LOCK_SECONDS = 10
+# Customer typeahead index, see account/typeahead.py
+TYPEAHEAD_REFRESH_SECONDS = 5
+TYPEAHEAD_REBUILD_SECONDS = 60 * 60
+# account.renderers uses orjson when it is installed; set False to force the stdlib encoder
+JSON_RENDERER_USE_ORJSON = True
 
 
 # Default primary key field type
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet,WalletTransaction
+from .models import Wallet,WalletTransaction,TreasuryStripe,MonthlyBalance,DailySummary,StatementJob
 
 class WalletAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'account_balance', 'created_at', 'updated_at')
@@ -31,5 +31,38 @@ class WalletTransactionAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+class TreasuryStripeAdmin(admin.ModelAdmin):
+    list_display = ('stripe', 'balance', 'updated_at')
+    readonly_fields = ('stripe', 'balance', 'updated_at')
+    ordering = ('stripe',)
+
+class MonthlyBalanceAdmin(admin.ModelAdmin):
+    list_display = ('customer', 'year', 'month', 'closing_balance', 'last_transaction_at')
+    list_filter = ('year', 'month')
+    search_fields = ('customer__name', 'customer__email')
+    readonly_fields = ('customer', 'year', 'month', 'closing_balance', 'last_transaction_at')
+    ordering = ('-year', '-month')
+
+class DailySummaryAdmin(admin.ModelAdmin):
+    list_display = ('summary_date', 'transaction_type', 'stripe', 'total_amount', 'transaction_count')
+    list_filter = ('transaction_type', 'summary_date')
+    readonly_fields = ('summary_date', 'transaction_type', 'stripe', 'total_amount', 'transaction_count')
+    ordering = ('-summary_date', 'transaction_type', 'stripe')
+
+class StatementJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'customer', 'start_date', 'end_date', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('requested_by__name', 'requested_by__email', 'customer__name', 'customer__email')
+    readonly_fields = (
+        'id', 'requested_by', 'customer', 'start_date', 'end_date', 'dedupe_key', 'status', 'attempts',
+        'file_path', 'filename', 'error', 'created_at', 'started_at', 'heartbeat_at', 'next_attempt_at',
+        'finished_at'
+    )
+    ordering = ('-created_at',)
+
 admin.site.register(WalletTransaction, WalletTransactionAdmin)
 admin.site.register(Wallet, WalletAdmin)
+admin.site.register(TreasuryStripe, TreasuryStripeAdmin)
+admin.site.register(MonthlyBalance, MonthlyBalanceAdmin)
+admin.site.register(DailySummary, DailySummaryAdmin)
+admin.site.register(StatementJob, StatementJobAdmin)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Admission control for PDF rendering.
+
+A request may render only while it holds a slot in its worker
+(``PDF_MAX_CONCURRENT_PER_WORKER``, which only bites with threaded workers)
+and one of the host-wide slots (``PDF_MAX_CONCURRENT_PER_HOST``). Host slots
+are ``flock``-ed files in ``PDF_ADMISSION_LOCK_DIR``, so they are shared by
+every gunicorn worker on the machine and freed by the kernel if a worker dies.
+A request polls for both for up to ``PDF_ADMISSION_WAIT_SECONDS``, then gets
+``RenderingOverloaded``, which the views answer with 503 and ``Retry-After``.
+A waiting worker serves nothing else, so the wait stays short (a second or
+two, well under the request timeout): enough to ride out a render finishing,
+not to queue behind a burst of statements while postings wait.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from user_wallet import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: per-worker limit only
+    fcntl = None
+
+
+class RenderingOverloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Too many PDFs are being generated right now.")
+        self.retry_after = retry_after
+
+
+_lock = threading.Lock()
+_semaphore = None
+_semaphore_pid = None
+
+
+def _worker_slots():
+    global _semaphore, _semaphore_pid
+    with _lock:
+        if _semaphore is None or _semaphore_pid != os.getpid():
+            _semaphore = threading.BoundedSemaphore(getattr(settings, 'PDF_MAX_CONCURRENT_PER_WORKER', 1))
+            _semaphore_pid = os.getpid()
+        return _semaphore
+
+
+def _try_host_slot(lock_dir, slots):
+    """Lock a free slot file and return its descriptor, or None if all are taken."""
+    first = random.randrange(slots)
+    for i in range(slots):
+        path = os.path.join(lock_dir, f"slot-{(first + i) % slots}.lock")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _acquire_host_slot(deadline):
+    slots = getattr(settings, 'PDF_MAX_CONCURRENT_PER_HOST', 0)
+    if not slots or fcntl is None:
+        return None, True
+    lock_dir = str(settings.PDF_ADMISSION_LOCK_DIR)
+    os.makedirs(lock_dir, exist_ok=True)
+    delay = 0.02
+    while True:
+        fd = _try_host_slot(lock_dir, slots)
+        if fd is not None:
+            return fd, True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None, False
+        time.sleep(min(remaining, random.uniform(0, delay)))
+        delay = min(delay * 2, 0.25)
+
+
+@contextmanager
+def admit():
+    """Hold a worker slot and a host slot for the duration of one render."""
+    wait = getattr(settings, 'PDF_ADMISSION_WAIT_SECONDS', 1)
+    retry_after = getattr(settings, 'PDF_RETRY_AFTER_SECONDS', 10)
+    started = time.monotonic()
+    deadline = started + wait
+
+    semaphore = _worker_slots()
+    if not semaphore.acquire(timeout=wait):
+        metrics.observe('pdf_admission.wait', time.monotonic() - started)
+        metrics.increment('pdf_admission.rejected')
+        raise RenderingOverloaded(retry_after)
+    try:
+        fd, admitted = _acquire_host_slot(deadline)
+        metrics.observe('pdf_admission.wait', time.monotonic() - started)
+        if not admitted:
+            metrics.increment('pdf_admission.rejected')
+            raise RenderingOverloaded(retry_after)
+        metrics.increment('pdf_admission.admitted')
+        try:
+            yield
+        finally:
+            if fd is not None:
+                os.close(fd)  # Releases the flock
+    finally:
+        semaphore.release()
+
+
+def overloaded_response(error):
+    return Response({
+        'success': False,
+        'status': status.HTTP_503_SERVICE_UNAVAILABLE,
+        'message': "PDF generation is busy right now. Please retry shortly.",
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(error.retry_after)})
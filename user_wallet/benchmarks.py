@@ -0,0 +1,618 @@
+"""
+Benchmark scenarios for the wallet write and read paths.
+
+Run them with ``python manage.py bench <scenario>``. Scenarios work inside a
+transaction that is rolled back at the end, so the seeded rows never reach
+the database. Concurrency scenarios need committed rows and are marked with
+``commits = True``; they remove their own data when done.
+"""
+from collections import defaultdict
+import itertools
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+from django.db import connection, connections, reset_queries, transaction
+from django.db.models.functions import ExtractMonth
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.timezone import now
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from account.models import User
+from account.typeahead import PrefixIndex
+from user_wallet import rollups, search, treasury
+from user_wallet.models import Wallet, WalletTransaction
+from user_wallet.transaction_ids import allocate_transaction_id
+
+
+_sequence = itertools.count()
+
+
+def make_customer(prefix='bench'):
+    """Create a verified customer with an empty wallet."""
+    n = next(_sequence)
+    token = uuid.uuid4().hex[:12]
+    user = User.objects.create_user(
+        name=f"{prefix} customer {n}",
+        email=f"{prefix}-{token}@bench.local",
+        phone_no=f"+99{int(token, 16) % 10**12:012d}",
+        password=uuid.uuid4().hex,
+        is_verified=True,
+    )
+    wallet = Wallet.objects.create(user=user)
+    return user, wallet
+
+
+def make_staff(prefix='bench'):
+    """Create a verified employee used as ``processed_by``."""
+    token = uuid.uuid4().hex[:12]
+    return User.objects.create_user(
+        name=f"{prefix} employee",
+        email=f"{prefix}-staff-{token}@bench.local",
+        phone_no=f"+98{int(token, 16) % 10**12:012d}",
+        password=uuid.uuid4().hex,
+        role='employee',
+        is_verified=True,
+    )
+
+
+def seed_transactions(customer, wallet, count, processed_by=None, batch_size=5000, index=False):
+    """
+    Bulk insert ``count`` deposits of 1.00 for ``customer`` and sync the
+    wallet. ``index`` also writes their search grams.
+    """
+    balance = Decimal(str(wallet.account_balance))  # a fresh Wallet still holds the float default
+    remaining = count
+    while remaining > 0:
+        rows = []
+        for _ in range(min(batch_size, remaining)):
+            balance += Decimal('1.00')
+            rows.append(WalletTransaction(
+                transaction_id=allocate_transaction_id(),
+                customer=customer,
+                transaction_type='deposit',
+                payment_method='cash',
+                amount=Decimal('1.00'),
+                cumulative_balance=balance,
+                processed_by=processed_by,
+            ))
+        WalletTransaction.objects.bulk_create(rows, batch_size=batch_size)
+        if index:
+            search.index_transactions(rows)
+        remaining -= len(rows)
+    wallet.account_balance = balance
+    wallet.save()
+
+
+def timed(func, iterations):
+    """Return (mean seconds per call, queries per call) for ``func``."""
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - started
+    return elapsed / iterations, len(ctx.captured_queries) / iterations
+
+
+class Rollback(Exception):
+    pass
+
+
+def run_rolled_back(func, *args, **kwargs):
+    """Run ``func`` in a transaction and discard everything it wrote."""
+    result = None
+    try:
+        with transaction.atomic():
+            result = func(*args, **kwargs)
+            raise Rollback
+    except Rollback:
+        pass
+    return result
+
+
+# ----------------------------------------
+# Scenarios
+# ----------------------------------------
+
+def bench_posting(out, sizes, iterations, **options):
+    """Posting latency against the number of prior transactions of the customer."""
+    staff = make_staff()
+    out.write(f"{'prior txns':>12} {'ms/posting':>12} {'queries':>8}")
+    for size in sizes:
+        customer, wallet = make_customer()
+        seed_transactions(customer, wallet, size, processed_by=staff)
+
+        def post():
+            locked = Wallet.objects.select_for_update().get(user=customer)
+            locked.account_balance += Decimal('1.00')
+            locked.save()
+            WalletTransaction(
+                customer=customer,
+                transaction_type='deposit',
+                payment_method='cash',
+                amount=Decimal('1.00'),
+                processed_by=staff,
+            ).save(wallet=locked)
+
+        mean, queries = timed(post, iterations)
+        out.write(f"{size:>12} {mean * 1000:>12.3f} {queries:>8.1f}")
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+def bench_bulk_posting(out, sizes, iterations, **options):
+    """Rows per second through transaction/ one by one versus transactions/bulk/."""
+    from user_wallet.views import BulkTransactionAPIView, TransactionAPIView
+
+    factory = APIRequestFactory()
+    staff = make_staff()
+    single_view = TransactionAPIView.as_view()
+    bulk_view = BulkTransactionAPIView.as_view()
+
+    def deposit(customer):
+        return {
+            'customer': str(customer.pk),
+            'transaction_type': 'deposit',
+            'payment_method': 'cash',
+            'amount': '10.00',
+        }
+
+    out.write(f"{'rows':>8} {'single rows/s':>14} {'bulk rows/s':>12} {'speedup':>8}")
+    for size in sizes:
+        customers = [make_customer()[0] for _ in range(min(size, 50))]
+        rows = [deposit(customers[i % len(customers)]) for i in range(size)]
+
+        started = time.perf_counter()
+        for row in rows:
+            request = factory.post('/wallet-api/transaction/', row, format='json')
+            force_authenticate(request, user=staff)
+            single_view(request)
+        single_rate = size / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        request = factory.post('/wallet-api/transactions/bulk/', rows, format='json')
+        force_authenticate(request, user=staff)
+        bulk_view(request)
+        bulk_rate = size / (time.perf_counter() - started)
+
+        out.write(f"{size:>8} {single_rate:>14.1f} {bulk_rate:>12.1f} {bulk_rate / single_rate:>7.1f}x")
+
+
+def bench_treasury_scaling(out, workers, iterations, **options):
+    """Postings per second to distinct customers as workers are added, one stripe versus the default."""
+    staff = make_staff()
+    customers = [make_customer()[0] for _ in range(max(workers))]
+
+    def post(customer):
+        with transaction.atomic():
+            wallet = Wallet.objects.select_for_update().get(user=customer)
+            wallet.account_balance += Decimal('1.00')
+            wallet.save()
+            WalletTransaction(
+                customer=customer,
+                transaction_type='deposit',
+                payment_method='cash',
+                amount=Decimal('1.00'),
+                processed_by=staff,
+            ).save(wallet=wallet)
+            treasury.credit(customer.pk, Decimal('1.00'))
+
+    def run(count):
+        start = threading.Barrier(count + 1)
+
+        def worker(customer):
+            start.wait()
+            try:
+                for _ in range(iterations):
+                    post(customer)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(customers[i],)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return count * iterations / (time.perf_counter() - started)
+
+    out.write(f"{'workers':>8} {'1 stripe/s':>12} {f'{treasury.stripe_count()} stripes/s':>14}")
+    credited = defaultdict(Decimal)
+    try:
+        for count in workers:
+            with override_settings(TREASURY_STRIPES=1):
+                single = run(count)
+            striped = run(count)
+            for customer in customers[:count]:
+                credited[0] += iterations
+                credited[treasury.stripe_for(customer.pk)] += iterations
+            out.write(f"{count:>8} {single:>12.1f} {striped:>14.1f}")
+    finally:
+        # Remove everything the workers committed
+        treasury.apply_deltas({stripe: -Decimal(amount) for stripe, amount in credited.items()})
+        WalletTransaction.objects.filter(customer__in=customers).delete()
+        Wallet.objects.filter(user__in=customers).delete()
+        User.objects.filter(pk__in=[customer.pk for customer in customers] + [staff.pk]).delete()
+
+
+# Needs committed data visible to the worker threads, cleans up after itself
+bench_treasury_scaling.commits = True
+
+
+def legacy_monthly_totals(year):
+    """The staff wallet overview before the monthly rollup: a Python scan of the year."""
+    monthly = defaultdict(dict)
+    queryset = (
+        WalletTransaction.objects.filter(created_at__year=year)
+        .annotate(month=ExtractMonth('created_at'))
+        .order_by('customer_id', 'month', '-created_at')
+    )
+    for tx in queryset:
+        if tx.customer_id not in monthly[tx.month]:
+            monthly[tx.month][tx.customer_id] = float(tx.cumulative_balance or 0)
+    return {month: sum(balances.values()) for month, balances in monthly.items()}
+
+
+def measured(func):
+    """Return (seconds, peak traced MiB, queries) for one call of ``func``."""
+    reset_queries()  # A full query log (from seeding) would make the capture come back empty
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / 2**20, len(ctx.captured_queries)
+
+
+def bench_wallet_overview(out, sizes, **options):
+    """Staff wallet overview: Python scan of the year versus the monthly balance rollup."""
+    staff = make_staff()
+    customers = [make_customer() for _ in range(100)]
+    year = now().year
+    seeded = 0
+    out.write(f"{'txns':>10} {'scan ms':>10} {'scan MiB':>9} {'rollup ms':>10} {'rollup MiB':>11} {'queries':>8}")
+    for size in sizes:
+        per_customer, extra = divmod(size - seeded, len(customers))
+        for i, (customer, wallet) in enumerate(customers):
+            count = per_customer + (1 if i < extra else 0)
+            if count:
+                seed_transactions(customer, wallet, count, processed_by=staff)
+        seeded = max(seeded, size)
+        rollups.rebuild(year=year)
+
+        scan_s, scan_mib, _ = measured(lambda: legacy_monthly_totals(year))
+        rollup_s, rollup_mib, queries = measured(lambda: rollups.monthly_totals(year))
+        out.write(f"{seeded:>10} {scan_s * 1000:>10.1f} {scan_mib:>9.1f} "
+                  f"{rollup_s * 1000:>10.2f} {rollup_mib:>11.3f} {queries:>8}")
+
+
+def bench_code_search(out, sizes, iterations, **options):
+    """transaction_id substring search: icontains scan versus the search gram index."""
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seeded = 0
+    out.write(f"{'txns':>10} {'query':>6} {'icontains ms':>13} {'indexed ms':>11}")
+    for size in sizes:
+        if size > seeded:
+            seed_transactions(customer, wallet, size - seeded, processed_by=staff, index=True)
+            seeded = size
+        sample = list(
+            WalletTransaction.objects.filter(customer=customer)
+            .order_by('?').values_list('transaction_id', flat=True)[:iterations]
+        )
+        base = WalletTransaction.objects.all()
+        for length in (2, 4, 6, 12):
+            queries = itertools.cycle(
+                code[start:start + length]
+                for code in sample
+                for start in [random.randint(0, max(0, len(code) - length))]
+            )
+
+            def scan():
+                list(base.filter(transaction_id__icontains=next(queries))[:10])
+
+            def indexed():
+                list(search.filter_by_code(base, 'transaction_id', next(queries))[:10])
+
+            scan_s, _ = timed(scan, iterations)
+            indexed_s, _ = timed(indexed, iterations)
+            out.write(f"{seeded:>10} {length:>6} {scan_s * 1000:>13.2f} {indexed_s * 1000:>11.2f}")
+
+
+def bench_typeahead(out, sizes, iterations, **options):
+    """Customer suggest latency from the in-memory prefix index (synthetic customers, no database)."""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    out.write(f"{'customers':>10} {'build s':>8} {'us/query':>9}")
+    for size in sizes:
+        rows = []
+        for n in range(size):
+            first = ''.join(random.choices(letters, k=6))
+            last = ''.join(random.choices(letters, k=8))
+            rows.append((n, f"{first.title()} {last.title()}", f"{first}.{last}{n}@bench.local", f"+8801{random.randint(10**8, 10**9 - 1)}"))
+        started = time.perf_counter()
+        index = PrefixIndex.build(rows)
+        build = time.perf_counter() - started
+
+        sample = random.sample(rows, min(iterations, size))
+        queries = [row[1][:random.randint(1, 6)] for row in sample] + [row[3][4:random.randint(6, 12)] for row in sample]
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, 10)
+        per_query = (time.perf_counter() - started) / len(queries)
+        out.write(f"{size:>10} {build:>8.1f} {per_query * 1e6:>9.1f}")
+
+
+def bench_list_serialization(out, sizes, iterations, **options):
+    """transaction-history page serialization: DRF serializer versus the .values() fast path."""
+    from account.renderers import UserRenderer
+    from user_wallet.serializer import FastWalletTransactionListSerializer, WalletTransactionListSerializer
+
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, max(sizes), processed_by=staff)
+    base = WalletTransaction.objects.filter(customer=customer).order_by('-created_at')
+    renderer = UserRenderer()
+
+    def drf(size):
+        rows = list(base.select_related('customer', 'processed_by')[:size])
+        return WalletTransactionListSerializer(rows, many=True).data
+
+    def fast(size):
+        rows = list(FastWalletTransactionListSerializer.optimize_queryset(base)[:size])
+        return FastWalletTransactionListSerializer(rows, many=True).data
+
+    out.write(f"{'page size':>10} {'drf ms':>9} {'fast ms':>9} {'speedup':>8} {'identical':>10}")
+    for size in sizes:
+        identical = renderer.render(drf(size)) == renderer.render(fast(size))
+        drf_s, _ = timed(lambda: drf(size), iterations)
+        fast_s, _ = timed(lambda: fast(size), iterations)
+        out.write(f"{size:>10} {drf_s * 1000:>9.2f} {fast_s * 1000:>9.2f} {drf_s / fast_s:>7.1f}x {str(identical):>10}")
+
+
+def legacy_render(data):
+    """UserRenderer before single-pass encoding: a repr scan, then json.dumps with a default hook."""
+    import json
+
+    def convert(obj):
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+        elif isinstance(obj, Decimal):
+            return float(obj)
+        elif hasattr(obj, 'isoformat'):
+            return obj.isoformat()
+        return obj
+
+    if 'ErrorDetail' in str(data):
+        response = json.dumps(data, default=convert)
+    else:
+        response = json.dumps(data, default=convert)
+    return response.encode('utf-8')
+
+
+def bench_render(out, sizes, iterations, **options):
+    """Rendering transaction-history pages: old UserRenderer versus single-pass (stdlib and orjson)."""
+    from account import renderers
+    from user_wallet.serializer import FastWalletTransactionListSerializer
+
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, max(sizes), processed_by=staff)
+    rows = list(FastWalletTransactionListSerializer.optimize_queryset(
+        WalletTransaction.objects.filter(customer=customer).order_by('-created_at')
+    )[:max(sizes)])
+    renderer = renderers.UserRenderer()
+
+    out.write(f"{'rows':>8} {'legacy ms':>10} {'stdlib ms':>10} {'orjson ms':>10}")
+    for size in sizes:
+        # Raw values rows keep UUIDs, Decimals and datetimes for the default hook
+        page = {'success': True, 'status': 200, 'data': {'transactions_data': rows[:size]}}
+        legacy_s, _ = timed(lambda: legacy_render(page), iterations)
+        with override_settings(JSON_RENDERER_USE_ORJSON=False):
+            stdlib_s, _ = timed(lambda: renderer.render(page), iterations)
+        orjson_ms = '-'
+        if renderers.orjson is not None:
+            orjson_s, _ = timed(lambda: renderer.render(page), iterations)
+            orjson_ms = f"{orjson_s * 1000:.2f}"
+        out.write(f"{size:>8} {legacy_s * 1000:>10.2f} {stdlib_s * 1000:>10.2f} {orjson_ms:>10}")
+
+
+def bench_receipt_pdf(out, iterations, **options):
+    """Single-transaction receipt PDF: full render versus a receipt cache hit."""
+    import tempfile
+    from user_wallet import pdf, receipt_cache
+
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, 1, processed_by=staff)
+    txn = WalletTransaction.objects.select_related('customer', 'processed_by').get(customer=customer)
+    iterations = min(iterations, 20)
+
+    with tempfile.TemporaryDirectory() as cache_dir, override_settings(RECEIPT_PDF_CACHE_DIR=cache_dir):
+        def cold():
+            receipt_cache.evict(limit=0)
+            pdf.render_transaction_receipt(txn, staff)
+
+        cold_s, _ = timed(cold, iterations)
+        hit_s, _ = timed(lambda: pdf.render_transaction_receipt(txn, staff), iterations)
+    out.write(f"{'render ms':>10} {'hit ms':>10}")
+    out.write(f"{cold_s * 1000:>10.2f} {hit_s * 1000:>10.2f}")
+
+
+def legacy_write_pdf(html_string, css_name):
+    """PDF rendering before the shared stylesheet, font and image caches."""
+    from django.conf import settings
+    from django.contrib.staticfiles import finders
+    from weasyprint import CSS, HTML
+
+    html = HTML(string=html_string, base_url=str(settings.STATIC_ROOT))
+    return html.write_pdf(stylesheets=[CSS(filename=finders.find(css_name))])
+
+
+def bench_receipt_render(out, iterations, **options):
+    """Receipt PDF render time per receipt (--iterations receipts, e.g. 1000): fresh assets versus cached ones."""
+    from user_wallet import pdf
+
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, iterations, processed_by=staff)
+    today = now().date()
+    pages = [
+        pdf.receipt_html(txn, staff.name, today)
+        for txn in WalletTransaction.objects.select_related('customer', 'processed_by').filter(customer=customer)
+    ]
+
+    started = time.perf_counter()
+    for page in pages:
+        legacy_write_pdf(page, 'CSS/transaction_receipt.css')
+    legacy_s = (time.perf_counter() - started) / len(pages)
+
+    pdf.warm()
+    started = time.perf_counter()
+    for page in pages:
+        pdf.write_pdf(page, 'CSS/transaction_receipt.css')
+    cached_s = (time.perf_counter() - started) / len(pages)
+
+    out.write(f"{'receipts':>8} {'fresh ms':>10} {'cached ms':>10}")
+    out.write(f"{len(pages):>8} {legacy_s * 1000:>10.2f} {cached_s * 1000:>10.2f}")
+
+
+def bench_pdf_assets(out, iterations, **options):
+    """Receipt and statement PDFs: original images versus print derivatives with image optimization (run collectstatic and then build_pdf_assets first)."""
+    import os
+    from datetime import date
+    from django.conf import settings
+    from django.template.loader import render_to_string
+    from user_wallet import pdf
+
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, 50, processed_by=staff)
+    transactions = WalletTransaction.objects.select_related('customer', 'processed_by').filter(customer=customer)
+    iterations = min(iterations, 20)
+    original_root = os.path.join(str(settings.STATIC_ROOT), 'IMAGE')
+    print_root = os.path.join(str(settings.STATIC_ROOT), pdf.PRINT_IMAGE_DIR)
+
+    def statement(image_dir):
+        return render_to_string('statement_templates.html', {
+            'customer': {'name': customer.name, 'email': customer.email, 'phone_no': customer.phone_no},
+            'transactions': transactions,
+            'from_date': date.today(),
+            'to_date': date.today(),
+            'today': date.today(),
+            'generated_by': staff.name,
+            'show_all_customers': False,
+            'IMAGE_ROOT': image_dir,
+        })
+
+    pages = {
+        'receipt': ('CSS/transaction_receipt.css', lambda d: pdf.receipt_html(transactions[0], staff.name, date.today(), image_dir=d)),
+        'statement': ('CSS/templates.css', statement),
+    }
+    out.write(f"{'template':>10} {'orig KB':>8} {'orig ms':>8} {'print KB':>9} {'print ms':>9}")
+    for name, (css_name, build) in pages.items():
+        original = build(original_root)
+        legacy_s, _ = timed(lambda: legacy_write_pdf(original, css_name), iterations)
+        legacy_kb = len(legacy_write_pdf(original, css_name)) / 1024
+        optimized = build(print_root)
+        pdf.write_pdf(optimized, css_name)  # load the derivatives once
+        print_s, _ = timed(lambda: pdf.write_pdf(optimized, css_name), iterations)
+        print_kb = len(pdf.write_pdf(optimized, css_name)) / 1024
+        out.write(f"{name:>10} {legacy_kb:>8.0f} {legacy_s * 1000:>8.1f} {print_kb:>9.0f} {print_s * 1000:>9.1f}")
+
+
+def bench_receipt_barcode(out, iterations, **options):
+    """Receipt render time per receipt with a PNG barcode versus an inline SVG one (uncached barcodes)."""
+    from user_wallet import barcodes, pdf
+
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, iterations, processed_by=staff)
+    transactions = list(WalletTransaction.objects.select_related('customer', 'processed_by').filter(customer=customer))
+    today = now().date()
+    pdf.warm()
+
+    out.write(f"{'format':>8} {'ms':>8} {'PDF KB':>8}")
+    for barcode_format in ('png', 'svg'):
+        barcodes.svg_markup.cache_clear()
+        barcodes.png_base64.cache_clear()
+        size = 0
+        with override_settings(RECEIPT_BARCODE_FORMAT=barcode_format):
+            started = time.perf_counter()
+            for txn in transactions:
+                size += len(pdf.write_pdf(pdf.receipt_html(txn, staff.name, today), 'CSS/transaction_receipt.css'))
+            elapsed = time.perf_counter() - started
+        out.write(f"{barcode_format:>8} {elapsed / len(transactions) * 1000:>8.2f} {size / len(transactions) / 1024:>8.1f}")
+
+
+def bench_statement_memory(out, sizes, **options):
+    """Statement PDF peak traced memory and time: one document from model instances versus chunks from .values() (try --sizes 10000,100000,1000000)."""
+    from datetime import date
+    from user_wallet import pdf
+
+    legacy_max_rows = 100000  # a single document past this needs gigabytes
+    staff = make_staff()
+    customer, wallet = make_customer()
+    seed_transactions(customer, wallet, max(sizes), processed_by=staff)
+    transactions = WalletTransaction.objects.select_related('customer', 'processed_by').filter(
+        customer=customer,
+    ).order_by('-created_at')
+    context = {
+        'customer': {'name': customer.name, 'email': customer.email, 'phone_no': customer.phone_no},
+        'from_date': date.today(),
+        'to_date': date.today(),
+        'today': date.today(),
+        'generated_by': staff.name,
+        'show_all_customers': False,
+    }
+
+    def single(size):
+        rows = [
+            {
+                **{name: getattr(txn, name) for name in pdf.STATEMENT_FIELDS},
+                'customer_name': txn.customer.name,
+                'customer_phone_no': txn.customer.phone_no,
+                'processed_by_name': txn.processed_by.name,
+            }
+            for txn in list(transactions[:size])
+        ]
+        return pdf.statement_pdf({**context, 'transactions': rows})
+
+    def chunked(size):
+        return pdf.render_statement_pdf(context, pdf.statement_rows(transactions[:size]), size)
+
+    out.write(f"{'rows':>8} {'single MiB':>11} {'single s':>9} {'chunked MiB':>12} {'chunked s':>10} {'PDF MiB':>8}")
+    with override_settings(PDF_RENDERER_SOCKET=''):
+        for size in sizes:
+            single_mib = single_s = '-'
+            if size <= legacy_max_rows:
+                seconds, peak, _ = measured(lambda: single(size))
+                single_mib, single_s = f"{peak:.0f}", f"{seconds:.1f}"
+            result = {}
+            seconds, peak, _ = measured(lambda: result.setdefault('pdf', chunked(size)))
+            out.write(
+                f"{size:>8} {single_mib:>11} {single_s:>9} {peak:>12.0f} {seconds:>10.1f}"
+                f" {len(result['pdf']) / 2**20:>8.1f}"
+            )
+
+SCENARIOS = {
+    'posting': bench_posting,
+    'bulk_posting': bench_bulk_posting,
+    'treasury_scaling': bench_treasury_scaling,
+    'wallet_overview': bench_wallet_overview,
+    'code_search': bench_code_search,
+    'typeahead': bench_typeahead,
+    'list_serialization': bench_list_serialization,
+    'render': bench_render,
+    'receipt_pdf': bench_receipt_pdf,
+    'receipt_render': bench_receipt_render,
+    'pdf_assets': bench_pdf_assets,
+    'receipt_barcode': bench_receipt_barcode,
+    'statement_memory': bench_statement_memory,
+}
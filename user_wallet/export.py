@@ -0,0 +1,107 @@
+"""
+Streaming CSV / NDJSON export of wallet transactions.
+
+Rows are read in chunks and written out as they arrive, so memory use does
+not grow with the size of the export and the first bytes are sent before the
+query has finished. On PostgreSQL and SQLite ``iterator()`` streams from the
+database cursor. MySQL drivers buffer a whole result set, so there the rows
+are fetched in keyset-ordered chunks of ``chunk_size``.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.timezone import localtime
+
+
+COLUMNS = [
+    ('transaction_id', 'transaction_id'),
+    ('date_of_transaction', 'date_of_transaction'),
+    ('created_at', 'created_at'),
+    ('customer_id', 'customer__id'),
+    ('customer_name', 'customer__name'),
+    ('customer_email', 'customer__email'),
+    ('transaction_type', 'transaction_type'),
+    ('payment_method', 'payment_method'),
+    ('amount', 'amount'),
+    ('cumulative_balance', 'cumulative_balance'),
+    ('receipt_reference_no', 'receipt_reference_no'),
+    ('document_photo_url', 'document_photo_url'),
+    ('comment', 'comment'),
+    ('processed_by', 'processed_by__name'),
+]
+HEADER = [name for name, _ in COLUMNS]
+# Flush the output buffer to the client at about this many bytes
+FLUSH_BYTES = 64 * 1024
+
+
+def format_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return localtime(value).isoformat() if value.tzinfo else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def iter_rows(queryset, chunk_size=2000):
+    """Yield export rows (tuples in ``COLUMNS`` order), oldest first."""
+    lookups = [lookup for _, lookup in COLUMNS] + ['id']
+    queryset = queryset.order_by('created_at', 'id')
+
+    if connections[queryset.db].vendor != 'mysql':
+        for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+            yield row[:-1]
+        return
+
+    created_at_index = lookups.index('created_at')
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(Q(created_at__gt=last[0]) | Q(created_at=last[0], id__gt=last[1]))
+        rows = list(chunk.values_list(*lookups)[:chunk_size])
+        for row in rows:
+            yield row[:-1]
+        if len(rows) < chunk_size:
+            return
+        last = (rows[-1][created_at_index], rows[-1][-1])
+
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for row in rows:
+        writer.writerow(['' if value is None else format_value(value) for value in row])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def stream_ndjson(rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(json.dumps(dict(zip(HEADER, map(format_value, row)))))
+        buffer.write('\n')
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8', 'ndjson'),
+}
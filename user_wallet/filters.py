@@ -0,0 +1,79 @@
+"""
+Query-parameter filters shared by the transaction list and export endpoints.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from account.permissions import AUTHORIZED_ROLES
+from user_wallet import search
+
+
+def filter_transactions(queryset, user, params):
+    """
+    Apply the transaction-history filters in ``params`` to ``queryset``.
+    Customers only ever see their own transactions. Raises ``ValueError``
+    with a client-facing message for invalid parameters.
+    """
+    customer = params.get("customer")
+    transaction_type = params.get("transaction_type")
+    payment_method = params.get("payment_method")
+    date_filter_type = params.get("date_filter_type")
+    date_of_transaction = params.get("date_of_transaction")
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    transaction_id = params.get("transaction_id")
+    receipt_reference_no = params.get("receipt_reference_no")
+
+    # ----------------------------------------
+    # Authorization & customer filtering
+    # ----------------------------------------
+    if user.role not in AUTHORIZED_ROLES:
+        # Non-authorized users: only their transactions
+        queryset = queryset.filter(customer=user)
+    elif customer:
+        try:
+            customer_id = uuid.UUID(customer)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Something went wrong with customer ID filter: " + str(e))
+        queryset = queryset.filter(customer__id=customer_id)
+
+    # ----------------------------------------
+    # Other filters
+    # ----------------------------------------
+    if transaction_id:
+        queryset = search.filter_by_code(queryset, 'transaction_id', transaction_id)
+    if receipt_reference_no:
+        queryset = search.filter_by_code(queryset, 'receipt_reference_no', receipt_reference_no)
+    if transaction_type:
+        queryset = queryset.filter(transaction_type__iexact=transaction_type)
+    if payment_method:
+        queryset = queryset.filter(payment_method__iexact=payment_method)
+
+    # ----------------------------------------
+    # Date filtering
+    # ----------------------------------------
+    if date_filter_type:
+        if date_filter_type not in ["single", "range"]:
+            raise ValueError("date_filter_type must be 'single' or 'range'.")
+
+        if date_filter_type == "single" and date_of_transaction:
+            try:
+                start = datetime.strptime(date_of_transaction, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("Invalid 'date_of_transaction'. Use YYYY-MM-DD.")
+            end = start + timedelta(days=1)
+            queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+
+        elif date_filter_type == "range":
+            if not (start_date and end_date):
+                raise ValueError("Both start_date and end_date are required for range.")
+            try:
+                start = datetime.strptime(start_date, "%Y-%m-%d")
+                end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+            except ValueError:
+                raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+            if end < start:
+                raise ValueError("End date cannot be before start date.")
+            queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+
+    return queryset
@@ -0,0 +1,129 @@
+"""
+``Idempotency-Key`` support for posting endpoints.
+
+The key row is inserted inside the same transaction as the posting. A
+concurrent request with the same key blocks on the unique index until the
+first one finishes, then either replays its committed response or, if the
+first attempt rolled back, performs the posting itself. Replays never touch
+the wallets.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+
+from user_wallet.locking import WalletLockError, atomic_with_retry, wallet_busy_response
+from user_wallet.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _file_digest(upload):
+    """sha256 of an uploaded file's contents, leaving it rewound for the view."""
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def request_fingerprint(request):
+    """Hash of the method, path and body, to catch a key reused for another request."""
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict from form posts
+        data = dict(data.lists())
+    # Uploads count by content: the same filename with other rows is another request
+    files = {
+        name: [(upload.name, _file_digest(upload)) for upload in uploads]
+        for name, uploads in request.FILES.lists()
+    }
+    payload = json.dumps(
+        [request.method, request.path, data, files], sort_keys=True, cls=DjangoJSONEncoder, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """Insert the key row, or return the existing live one."""
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_fingerprint=fingerprint,
+                    expires_at=now() + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL_SECONDS', 86400)),
+                )
+            return None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if existing is None:
+                continue
+            if existing.expires_at > now():
+                return existing
+            # Expired: forget it and claim the key again
+            existing.delete()
+    raise IntegrityError(f"Could not claim idempotency key '{key}'.")
+
+
+def idempotent(view_method):
+    """Make a POST handler replay its stored response for a repeated Idempotency-Key."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response({
+                'success': False,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'message': f'{IDEMPOTENCY_HEADER} must be at most 255 characters.',
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+
+        def attempt():
+            existing = _claim(request.user, key, fingerprint)
+            if existing is not None:
+                if existing.request_fingerprint != fingerprint:
+                    return Response({
+                        'success': False,
+                        'status': status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        'message': f'{IDEMPOTENCY_HEADER} has already been used for a different request.',
+                    }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return Response(
+                    existing.response_body,
+                    status=existing.response_status,
+                    headers={'Idempotent-Replayed': 'true'},
+                )
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                # Server errors are not replayed; let the client retry
+                IdempotencyKey.objects.filter(user=request.user, key=key).delete()
+            else:
+                IdempotencyKey.objects.filter(user=request.user, key=key).update(
+                    response_status=response.status_code,
+                    response_body=response.data,
+                )
+            return response
+
+        # The key row and the posting share one transaction, so a deadlock
+        # inside the handler retries the claim as well
+        try:
+            return atomic_with_retry(attempt)
+        except WalletLockError as e:
+            return wallet_busy_response(e)
+
+    return wrapper
@@ -0,0 +1,117 @@
+"""
+Wallet row locking with a canonical order, lock timeouts and retries.
+
+Every flow that locks more than one wallet must go through ``lock_wallets``,
+which always acquires rows in wallet primary key order, so two flows can
+never wait on each other in a cycle. ``atomic_with_retry`` runs a function in
+a transaction and restarts it when the database reports a deadlock, a
+serialization failure or a lock timeout.
+"""
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from user_wallet import metrics
+from user_wallet.models import Wallet
+
+
+# PostgreSQL: serialization_failure, deadlock_detected, lock_not_available
+RETRYABLE_SQLSTATES = {'40001', '40P01', '55P03'}
+# MySQL: deadlock found, lock wait timeout exceeded
+RETRYABLE_MYSQL_ERRORS = {1213, 1205}
+
+
+class WalletLockError(Exception):
+    """The wallets could not be locked, even after retrying."""
+
+
+class TransientConflict(Exception):
+    """
+    A retryable database error raised inside a nested atomic block. Only the
+    outermost block can be retried, so this is passed up to it.
+    """
+
+
+def is_retryable(exc):
+    cause = exc.__cause__ or exc
+    sqlstate = getattr(cause, 'pgcode', None) or getattr(getattr(cause, 'diag', None), 'sqlstate', None)
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+    args = getattr(cause, 'args', ())
+    if args and args[0] in RETRYABLE_MYSQL_ERRORS:
+        return True
+    # SQLite reports lock contention as "database is locked"
+    return 'database is locked' in str(exc)
+
+
+def set_lock_timeout(seconds):
+    """Bound how long the current transaction waits for a row lock."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", [f"{int(seconds * 1000)}ms"])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SET SESSION innodb_lock_wait_timeout = %s", [max(1, int(seconds))])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"PRAGMA busy_timeout = {int(seconds * 1000)}")
+
+
+def lock_wallets(user_ids, timeout=None):
+    """
+    Lock the wallets of ``user_ids`` in canonical order and return them as
+    ``{str(user_id): wallet}``, keyed by the canonical UUID string whatever
+    form the ids came in. Must be called inside a transaction.
+    """
+    set_lock_timeout(timeout or getattr(settings, 'WALLET_LOCK_TIMEOUT_SECONDS', 5))
+    user_ids = {uuid.UUID(str(user_id)) for user_id in user_ids}
+    wallets = Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk')
+    return {str(wallet.user_id): wallet for wallet in wallets}
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff in seconds."""
+    base = getattr(settings, 'WALLET_LOCK_BACKOFF_SECONDS', 0.05)
+    return random.uniform(0, base * 2 ** (attempt - 1))
+
+
+def atomic_with_retry(func, *args, attempts=None, **kwargs):
+    """
+    Run ``func`` in ``transaction.atomic()``, retrying the whole block on
+    deadlocks, serialization failures and lock timeouts. Raises
+    ``WalletLockError`` once the retries are used up.
+    """
+    if connection.in_atomic_block:
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except DatabaseError as e:
+            if is_retryable(e):
+                raise TransientConflict(str(e)) from e
+            raise
+
+    attempts = attempts or getattr(settings, 'WALLET_LOCK_RETRIES', 3)
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except (DatabaseError, TransientConflict) as e:
+            if isinstance(e, DatabaseError) and not is_retryable(e):
+                raise
+            metrics.increment('wallet_lock.conflicts')
+            if attempt == attempts:
+                metrics.increment('wallet_lock.retries_exhausted')
+                raise WalletLockError(f"Wallets are busy, gave up after {attempts} attempts: {str(e)}") from e
+            metrics.increment('wallet_lock.retries')
+            time.sleep(backoff(attempt))
+
+
+def wallet_busy_response(error):
+    return Response({
+        'success': False,
+        'status': status.HTTP_503_SERVICE_UNAVAILABLE,
+        'message': "The wallet is busy with other transactions. Please retry.",
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user_wallet.benchmarks import SCENARIOS, run_rolled_back
+
+
+class Command(BaseCommand):
+    help = "Run a wallet benchmark scenario against the configured database (writes are rolled back or cleaned up)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--sizes', default='10,1000,100000,1000000',
+                            help="Comma separated dataset sizes to seed.")
+        parser.add_argument('--iterations', type=int, default=200,
+                            help="Measured operations per dataset size.")
+        parser.add_argument('--workers', default='1,2,4,8',
+                            help="Comma separated worker counts for concurrency scenarios.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options['sizes'].split(',') if s]
+            workers = [int(w) for w in options['workers'].split(',') if w]
+        except ValueError:
+            raise CommandError("--sizes and --workers must be comma separated integers.")
+
+        scenario = SCENARIOS[options['scenario']]
+        self.stdout.write(self.style.MIGRATE_HEADING(scenario.__doc__.strip()))
+        kwargs = {'sizes': sizes, 'iterations': options['iterations'], 'workers': workers}
+        if getattr(scenario, 'commits', False):
+            scenario(self.stdout, **kwargs)
+        else:
+            run_rolled_back(scenario, self.stdout, **kwargs)
@@ -0,0 +1,54 @@
+import math
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from user_wallet import pdf
+
+
+class Command(BaseCommand):
+    help = (
+        "Write print-resolution copies of the images embedded in receipt and statement PDFs "
+        "into STATIC_ROOT. Run after collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None,
+                            help="Where to write the copies (default: IMAGE/print in STATIC_ROOT).")
+        parser.add_argument('--dpi', type=int, default=None,
+                            help="Target resolution (default: settings.PDF_IMAGE_DPI).")
+
+    def handle(self, *args, **options):
+        dpi = options['dpi'] or getattr(settings, 'PDF_IMAGE_DPI', 300)
+        output_dir = options['output_dir']
+        if output_dir is None:
+            if not settings.STATIC_ROOT:
+                raise CommandError("STATIC_ROOT is not set; pass --output-dir.")
+            output_dir = os.path.join(str(settings.STATIC_ROOT), pdf.PRINT_IMAGE_DIR)
+        os.makedirs(output_dir, exist_ok=True)
+
+        for name, css_width in pdf.PDF_IMAGES.items():
+            source = finders.find(name)
+            if not source:
+                raise CommandError(f"{name} not found in static files")
+            # CSS pixels are 1/96 inch
+            max_width = math.ceil(css_width / 96 * dpi)
+            target = os.path.join(output_dir, os.path.basename(name))
+
+            with Image.open(source) as image:
+                image.load()
+                if image.width > max_width:
+                    height = max(1, round(image.height * max_width / image.width))
+                    image = image.resize((max_width, height), Image.LANCZOS)
+                if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                    image = image.convert('RGBA')
+                image.save(target, format='PNG', optimize=True)
+
+            self.stdout.write(
+                f"{name}: {os.path.getsize(source) / 1024:.0f} KB -> {os.path.getsize(target) / 1024:.0f} KB"
+                f" ({image.width}x{image.height})"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(pdf.PDF_IMAGES)} images to {output_dir}."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from user_wallet import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily transaction summaries used by the dashboard cards from the transaction history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD). Defaults to the first transaction.")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD). Defaults to the last transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_date(options['start']) if options['start'] else None
+            end = parse_date(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError("--start and --end must be valid dates in YYYY-MM-DD format.")
+        if (options['start'] and start is None) or (options['end'] and end is None):
+            raise CommandError("--start and --end must be valid dates in YYYY-MM-DD format.")
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end.")
+
+        written = rollups.rebuild_daily(start=start, end=end)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily summaries."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from user_wallet import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-customer monthly closing balances from the transaction history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help="Only rebuild this calendar year.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(year=options['year'], batch_size=options['batch_size'])
+        scope = options['year'] or 'all years'
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} monthly balances ({scope})."))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from user_wallet import pdf_renderer
+
+
+class Command(BaseCommand):
+    help = "Serve receipt and statement PDF renders to the API workers over a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None, help="Socket path (default: settings.PDF_RENDERER_SOCKET).")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Render processes, i.e. PDFs rendered at once (default: settings.PDF_RENDERER_WORKERS).")
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help="Replace a render process after this many PDFs, 0 for never.")
+
+    def handle(self, *args, **options):
+        path = options['socket'] or pdf_renderer.socket_path()
+        if not path:
+            raise CommandError("PDF_RENDERER_SOCKET is not set; pass --socket.")
+        workers = options['workers'] or getattr(settings, 'PDF_RENDERER_WORKERS', 2)
+        max_jobs = options['max_jobs']
+        if max_jobs is None:
+            max_jobs = getattr(settings, 'PDF_RENDERER_MAX_JOBS', 500)
+        try:
+            pdf_renderer.serve(path, workers, max_jobs=max_jobs, log=self.stdout.write)
+        except RuntimeError as e:
+            raise CommandError(str(e))
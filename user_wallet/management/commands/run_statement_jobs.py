@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_wallet import pdf_renderer, statement_jobs
+
+
+class Command(BaseCommand):
+    help = "Render queued statement PDFs. Run one process per core you want to spend on rendering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Render what is queued now and exit.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        pdf_renderer.warm_local()
+        last_purge = 0.0
+        while True:
+            if time.monotonic() - last_purge > 300:
+                statement_jobs.reclaim_stale()
+                statement_jobs.purge_expired()
+                last_purge = time.monotonic()
+
+            job = statement_jobs.claim_next()
+            if job is not None:
+                job = statement_jobs.run(job)
+                self.stdout.write(f"job={job.id} status={job.status}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
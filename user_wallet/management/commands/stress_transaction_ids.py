@@ -0,0 +1,58 @@
+import multiprocessing
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from user_wallet.transaction_ids import allocate_transaction_id
+
+
+TRANSACTION_ID_RE = re.compile(r'^TX[0-9A-Z]{10}$')
+
+
+def _mint(count):
+    return [allocate_transaction_id() for _ in range(count)]
+
+
+def _mint_in_threads(args):
+    count, threads = args
+    share, extra = divmod(count, threads)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        chunks = pool.map(_mint, [share + (1 if i < extra else 0) for i in range(threads)])
+        return [tx_id for chunk in chunks for tx_id in chunk]
+
+
+class Command(BaseCommand):
+    help = "Mint transaction IDs from several processes and threads at once and check they are unique."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2_000_000, help="Total IDs to mint.")
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--threads', type=int, default=4, help="Threads per process.")
+
+    def handle(self, *args, **options):
+        count, processes, threads = options['count'], options['processes'], options['threads']
+        if min(count, processes, threads) < 1:
+            raise CommandError("--count, --processes and --threads must be positive.")
+
+        # Forked children must open their own connections
+        connections.close_all()
+        share, extra = divmod(count, processes)
+        jobs = [(share + (1 if i < extra else 0), threads) for i in range(processes)]
+
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            minted = [tx_id for chunk in pool.map(_mint_in_threads, jobs) for tx_id in chunk]
+        elapsed = time.perf_counter() - started
+
+        malformed = [tx_id for tx_id in minted if not TRANSACTION_ID_RE.match(tx_id)]
+        duplicates = len(minted) - len(set(minted))
+        self.stdout.write(
+            f"minted={len(minted)} processes={processes} threads={threads} "
+            f"seconds={elapsed:.2f} ids/s={len(minted) / elapsed:,.0f}"
+        )
+        if malformed or duplicates:
+            raise CommandError(f"{duplicates} duplicate and {len(malformed)} malformed IDs (e.g. {malformed[:3]}).")
+        self.stdout.write(self.style.SUCCESS("All IDs unique and well formed."))
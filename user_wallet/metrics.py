@@ -0,0 +1,50 @@
+"""
+In-process operational metrics: counters and timings.
+
+Values are kept per worker process and reported by the metrics/ endpoint for
+the worker that serves the request, which is enough to scrape or eyeball
+retry, cache and queueing behaviour without an extra dependency.
+"""
+import os
+import threading
+from collections import defaultdict
+
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, seconds):
+    """Record one duration (in seconds) under ``name``."""
+    with _lock:
+        count, total, peak = _timings.get(name, (0, 0.0, 0.0))
+        _timings[name] = (count + 1, total + seconds, max(peak, seconds))
+
+
+def snapshot():
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'counters': dict(_counters),
+            'timings': {
+                name: {
+                    'count': count,
+                    'total_seconds': round(total, 6),
+                    'avg_seconds': round(total / count, 6) if count else 0.0,
+                    'max_seconds': round(peak, 6),
+                }
+                for name, (count, total, peak) in _timings.items()
+            },
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils.timezone import now
+
+
+def move_ceo_balance_to_treasury(apps, schema_editor):
+    """The CEO wallet balance becomes stripe 0 of the treasury."""
+    Wallet = apps.get_model('user_wallet', 'Wallet')
+    TreasuryStripe = apps.get_model('user_wallet', 'TreasuryStripe')
+    ceo_wallet = Wallet.objects.filter(user__role='CEO').first()
+    balance = ceo_wallet.account_balance if ceo_wallet else Decimal('0.00')
+    TreasuryStripe.objects.create(stripe=0, balance=balance, updated_at=now())
+    if ceo_wallet:
+        ceo_wallet.account_balance = Decimal('0.00')
+        ceo_wallet.save(update_fields=['account_balance'])
+
+
+def move_treasury_to_ceo_balance(apps, schema_editor):
+    Wallet = apps.get_model('user_wallet', 'Wallet')
+    TreasuryStripe = apps.get_model('user_wallet', 'TreasuryStripe')
+    total = TreasuryStripe.objects.aggregate(total=models.Sum('balance'))['total'] or Decimal('0.00')
+    Wallet.objects.filter(user__role='CEO').update(account_balance=models.F('account_balance') + total)
+    TreasuryStripe.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0003_transactionidblock'),
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreasuryStripe',
+            fields=[
+                ('stripe', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(move_ceo_balance_to_treasury, move_treasury_to_ceo_balance),
+    ]
@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.timezone import localtime
+
+
+def populate_monthly_balances(apps, schema_editor):
+    # Self-contained on purpose: user_wallet.rollups will keep changing. One
+    # row per customer and local month, with the balance of its last posting.
+    WalletTransaction = apps.get_model('user_wallet', 'WalletTransaction')
+    MonthlyBalance = apps.get_model('user_wallet', 'MonthlyBalance')
+    rows = (
+        WalletTransaction.objects.order_by('customer_id', 'created_at')
+        .values_list('customer_id', 'created_at', 'cumulative_balance')
+        .iterator(chunk_size=5000)
+    )
+    batch = []
+    customer, months = None, {}
+
+    def flush():
+        batch.extend(months.values())
+        if len(batch) >= 5000:
+            MonthlyBalance.objects.bulk_create(batch)
+            batch.clear()
+
+    for customer_id, created_at, balance in rows:
+        if customer_id != customer:
+            flush()
+            customer, months = customer_id, {}
+        local = localtime(created_at)
+        months[(local.year, local.month)] = MonthlyBalance(
+            customer_id=customer_id,
+            year=local.year,
+            month=local.month,
+            closing_balance=balance,
+            last_transaction_at=created_at,
+        )
+    flush()
+    MonthlyBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0005_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('closing_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_transaction_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'month'], name='monthlybalance_year_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'year', 'month'), name='unique_monthly_balance')],
+            },
+        ),
+        migrations.RunPython(populate_monthly_balances, migrations.RunPython.noop),
+    ]
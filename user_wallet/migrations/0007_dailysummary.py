@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_summaries(apps, schema_editor):
+    WalletTransaction = apps.get_model('user_wallet', 'WalletTransaction')
+    DailySummary = apps.get_model('user_wallet', 'DailySummary')
+    rows = (
+        WalletTransaction.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'transaction_type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    DailySummary.objects.bulk_create([
+        DailySummary(
+            summary_date=row['day'],
+            transaction_type=row['transaction_type'],
+            stripe=0,
+            total_amount=row['total'],
+            transaction_count=row['count'],
+        )
+        for row in rows
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0006_monthlybalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary_date', models.DateField()),
+                ('transaction_type', models.CharField(max_length=20)),
+                ('stripe', models.PositiveSmallIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('summary_date', 'transaction_type', 'stripe'), name='unique_daily_summary')],
+            },
+        ),
+        migrations.RunPython(populate_daily_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The index format as of this migration, kept here rather than imported from
+# user_wallet.search so later changes there can't alter the backfill
+FIELDS = {
+    'transaction_id': 't',
+    'receipt_reference_no': 'r',
+}
+
+
+def grams(value):
+    value = (value or '').strip().upper()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def populate_search_grams(apps, schema_editor):
+    WalletTransaction = apps.get_model('user_wallet', 'WalletTransaction')
+    TransactionSearchGram = apps.get_model('user_wallet', 'TransactionSearchGram')
+    batch = []
+    for txn in WalletTransaction.objects.only('id', 'transaction_id', 'receipt_reference_no').iterator(chunk_size=5000):
+        for field_name, code in FIELDS.items():
+            for gram in grams(getattr(txn, field_name)):
+                batch.append(TransactionSearchGram(transaction_id=txn.pk, field=code, gram=gram))
+        if len(batch) >= 20000:
+            TransactionSearchGram.objects.bulk_create(batch)
+            batch = []
+    TransactionSearchGram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0008_wallettransaction_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('t', 'Transaction ID'), ('r', 'Receipt reference')], max_length=1)),
+                ('gram', models.CharField(max_length=3)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_grams', to='user_wallet.wallettransaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'gram', 'transaction'], name='searchgram_lookup_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_grams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def backfill_heartbeats(apps, schema_editor):
+    # Jobs running during the upgrade count from their start, as before
+    StatementJob = apps.get_model('user_wallet', 'StatementJob')
+    StatementJob.objects.filter(status='running').update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0010_statementjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statementjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='statementjob',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeats, migrations.RunPython.noop),
+    ]
@@ -3,11 +3,11 @@ from django.db import models
 from django.utils.timezone import now
 from account.models import User  
 from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_save
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
-import random
-import string
 from account.permissions import AUTHORIZED_ROLES
+from user_wallet.transaction_ids import allocate_transaction_id
 
 class Wallet(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -18,10 +18,9 @@ class Wallet(models.Model):
     updated_at = models.DateTimeField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
-        if self.pk is not None:
-            # Check if this is an update (object exists in DB)
-            if Wallet.objects.filter(pk=self.pk).exists():
-                self.updated_at = now()
+        if not self._state.adding:
+            # Instance was loaded from the DB, so this is an update
+            self.updated_at = now()
         super(Wallet, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -29,9 +28,98 @@ class Wallet(models.Model):
 
 
 
-def generate_unique_transaction_id():
-    """Generate a unique 10-character alphanumeric transaction ID."""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+class TreasuryStripe(models.Model):
+    """
+    One slice of the house (CEO) balance. A posting updates the stripe picked
+    from its customer's id, so postings for different customers rarely wait
+    on the same row lock. The house balance is the sum of all stripes.
+    """
+    stripe = models.PositiveSmallIntegerField(primary_key=True)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Treasury stripe {self.stripe}: {self.balance}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a POST made with an ``Idempotency-Key`` header.
+    The row is inserted in the same transaction as the posting, so a retry
+    either finds the committed response or, if the first attempt rolled
+    back, runs again.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+class TransactionIdBlock(models.Model):
+    """High-water mark of a transaction_id sequence; workers reserve blocks from it."""
+    name = models.CharField(primary_key=True, max_length=50)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class MonthlyBalance(models.Model):
+    """
+    A customer's closing balance for a calendar month: the
+    ``cumulative_balance`` of their last transaction in that month. Kept up to
+    date by ``user_wallet.rollups`` whenever transactions are posted.
+    """
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="monthly_balances")
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    closing_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_transaction_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'year', 'month'], name='unique_monthly_balance'),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month'], name='monthlybalance_year_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} {self.year}-{self.month:02d}: {self.closing_balance}"
+
+
+class DailySummary(models.Model):
+    """
+    Transaction totals for one day and transaction type. Each day and type is
+    split over the treasury stripes (see ``user_wallet.treasury``) so postings
+    don't all queue on one row; readers sum the stripes.
+    """
+    summary_date = models.DateField()
+    transaction_type = models.CharField(max_length=20)
+    stripe = models.PositiveSmallIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['summary_date', 'transaction_type', 'stripe'], name='unique_daily_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.summary_date} {self.transaction_type} [{self.stripe}]: {self.total_amount}"
 
 class WalletTransaction(models.Model):
     TRANSACTION_TYPE_CHOICES = [
@@ -64,24 +152,36 @@ class WalletTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)  # Set only on creation
     updated_at = models.DateTimeField(null=True, blank=True)  # Set only on updates
 
-    def save(self, *args, **kwargs):
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='wallettxn_customer_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='wallettxn_created_id_idx'),
+        ]
+
+    def save(self, *args, wallet=None, **kwargs):
         """
         Override the save method to always call clean before saving.
+
+        Pass the customer's ``wallet`` (locked with select_for_update and already
+        updated for this posting) to take the running balance from it instead of
+        looking up the customer's latest transaction.
         """
         self.clean()  # Call the clean method to perform validation
         if self._state.adding:  # only when creating new transaction
-            last_txn = WalletTransaction.objects.filter(customer=self.customer).order_by('-created_at').first()
-            previous_balance = last_txn.cumulative_balance if last_txn else 0
-
-            if self.transaction_type == 'deposit':
-                self.cumulative_balance = previous_balance + self.amount
-            else:  # withdrawal or payout
-                self.cumulative_balance = previous_balance - self.amount
-
-        if self.pk is not None:
-            # Check if this is an update (object exists in DB)
-            if WalletTransaction.objects.filter(pk=self.pk).exists():
-                self.updated_at = now()
+            if wallet is not None:
+                # The wallet balance is the running balance after this posting
+                self.cumulative_balance = wallet.account_balance
+            else:
+                last_txn = WalletTransaction.objects.filter(customer=self.customer).order_by('-created_at').first()
+                previous_balance = last_txn.cumulative_balance if last_txn else 0
+
+                if self.transaction_type == 'deposit':
+                    self.cumulative_balance = previous_balance + self.amount
+                else:  # withdrawal or payout
+                    self.cumulative_balance = previous_balance - self.amount
+        else:
+            # Instance was loaded from the DB, so this is an update
+            self.updated_at = now()
         super(WalletTransaction, self).save(*args, **kwargs)
         
 
@@ -105,8 +205,85 @@ class WalletTransaction(models.Model):
 def add_transaction_id(sender, instance, **kwargs):
     """Assign a unique transaction_id if not already set."""
     if not instance.transaction_id:
-        while True:
-            transaction_id = generate_unique_transaction_id()
-            if not WalletTransaction.objects.filter(transaction_id=transaction_id).exists():
-                instance.transaction_id = f"TX{transaction_id}"
-                break
+        instance.transaction_id = allocate_transaction_id()
+
+
+class StatementJob(models.Model):
+    """
+    An account statement PDF rendered in the background by the
+    ``run_statement_jobs`` command. Identical requests that arrive while a
+    job is pending or running share it (same ``dedupe_key``).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="statement_jobs")
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    dedupe_key = models.CharField(max_length=64)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    file_path = models.CharField(max_length=500, null=True, blank=True)
+    filename = models.CharField(max_length=255, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the rendering worker; a running job whose heartbeat stops is requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # A job requeued after a failure is not claimed again before this
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_statement_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='statementjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Statement {self.start_date}..{self.end_date} for {self.requested_by_id} ({self.status})"
+
+class TransactionSearchGram(models.Model):
+    """
+    One 3-character slice of a transaction's ``transaction_id`` or
+    ``receipt_reference_no``. Substring searches intersect these rows instead
+    of scanning the transactions table, see ``user_wallet.search``.
+    """
+    FIELD_CHOICES = [
+        ('t', 'Transaction ID'),
+        ('r', 'Receipt reference'),
+    ]
+    transaction = models.ForeignKey(WalletTransaction, on_delete=models.CASCADE, related_name="search_grams")
+    field = models.CharField(max_length=1, choices=FIELD_CHOICES)
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', 'gram', 'transaction'], name='searchgram_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}:{self.gram} -> {self.transaction_id}"
+
+
+@receiver(post_save, sender=WalletTransaction)
+def index_transaction_codes(sender, instance, created, raw=False, **kwargs):
+    """Keep the search grams in step with transaction_id and receipt_reference_no."""
+    if raw:
+        return
+    from user_wallet.search import index_transactions
+    index_transactions([instance], replace=not created)
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Keyset pagination for transaction-history (``?pagination=cursor``).
+
+    Pages are located by ``created_at`` (with ``id`` as tie-breaker) instead
+    of an OFFSET, and no COUNT(*) is run, so every page costs the same no
+    matter how deep it is. Next/previous links carry an opaque ``cursor``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,378 @@
+"""
+PDF rendering for transaction receipts and account statements.
+
+Shared by the synchronous PDF views and the statement job worker
+(``run_statement_jobs``). The views check permissions, gather plain values
+and hand them to ``render_document``, which renders in the
+``run_pdf_renderer`` daemon when it is up and in this process otherwise. WeasyPrint and the barcode libraries
+are imported on first local render only, so API workers that never render
+locally don't load them.
+
+Stylesheets are parsed once per process against a shared
+``FontConfiguration``, and images loaded from static files are kept decoded
+between renders; ``warm()`` does all of that up front.
+"""
+import contextlib
+import functools
+import io
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from rest_framework import status
+
+from account.permissions import AUTHORIZED_ROLES
+from user_wallet import admission as admission_control
+from user_wallet import metrics, pdf_renderer, receipt_cache
+from user_wallet.models import WalletTransaction
+
+
+logger = logging.getLogger(__name__)
+
+
+class StatementError(Exception):
+    """A statement request that can't be served, with the HTTP status to answer."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+STYLESHEETS = ['CSS/transaction_receipt.css', 'CSS/templates.css']
+
+# Images the templates embed, with the CSS width (px) they are printed at.
+# ``build_pdf_assets`` writes print-resolution copies to PRINT_IMAGE_DIR.
+PDF_IMAGES = {
+    'IMAGE/bank_logo.png': 120,
+    'IMAGE/iBanking.png': 120,
+}
+PRINT_IMAGE_DIR = 'IMAGE/print'
+
+
+class StaticImageCache(dict):
+    """WeasyPrint image cache that skips ``data:`` URIs, which are unique per document."""
+
+    def __setitem__(self, url, image):
+        if not str(url).startswith('data:'):
+            super().__setitem__(url, image)
+
+
+_lock = threading.Lock()
+_font_config = None
+_stylesheets = {}
+_image_cache = StaticImageCache()
+
+
+def font_config():
+    global _font_config
+    if _font_config is None:
+        with _lock:
+            if _font_config is None:
+                from weasyprint.text.fonts import FontConfiguration
+                _font_config = FontConfiguration()
+    return _font_config
+
+
+def stylesheet(css_name):
+    """Parsed ``CSS`` for a static stylesheet, shared by every render in this process."""
+    css = _stylesheets.get(css_name)
+    if css is None:
+        from weasyprint import CSS
+        css_path = finders.find(css_name)
+        if not css_path:
+            raise FileNotFoundError(f"{css_name} not found in static files")
+        css = CSS(filename=css_path, font_config=font_config())
+        with _lock:
+            css = _stylesheets.setdefault(css_name, css)
+    return css
+
+
+@functools.lru_cache(maxsize=None)
+def image_root():
+    """Directory the templates load images from: the print derivatives once they are built."""
+    print_root = os.path.join(str(settings.STATIC_ROOT), PRINT_IMAGE_DIR)
+    if all(os.path.exists(os.path.join(print_root, os.path.basename(name))) for name in PDF_IMAGES):
+        return print_root
+    return os.path.join(str(settings.STATIC_ROOT), 'IMAGE')
+
+
+def pdf_options():
+    return {
+        'optimize_images': True,
+        'dpi': getattr(settings, 'PDF_IMAGE_DPI', 300),
+        'jpeg_quality': getattr(settings, 'PDF_JPEG_QUALITY', 85),
+        'full_fonts': False,  # embed only the glyphs a document uses
+    }
+
+
+def write_pdf(html_string, css_name, extra_css=None):
+    from weasyprint import CSS, HTML
+
+    stylesheets = [stylesheet(css_name)]
+    if extra_css:
+        stylesheets.append(CSS(string=extra_css, font_config=font_config()))
+    html = HTML(string=html_string, base_url=str(settings.STATIC_ROOT))
+    return html.write_pdf(
+        stylesheets=stylesheets,
+        font_config=font_config(),
+        cache=_image_cache,
+        **pdf_options(),
+    )
+
+
+def warm():
+    """Parse the stylesheets, load fonts and decode the static images before the first request."""
+    started = time.perf_counter()
+    images = ''.join(
+        f'<img src="{image_root()}/{os.path.basename(name)}">' for name in PDF_IMAGES
+    )
+    for css_name in STYLESHEETS:
+        write_pdf(f"<html><body><p>warm-up</p>{images}</body></html>", css_name)
+    metrics.observe('pdf.warm', time.perf_counter() - started)
+
+
+def render_transaction_receipt(transaction, user):
+    """PDF receipt for one transaction, as downloaded by ``user``."""
+    customer = transaction.customer
+    today = date.today()
+    generated_by = user.name if user.id != customer.id else f"{user.name} -(Self)"
+
+    key = receipt_cache.cache_key(transaction, generated_by, today)
+    cached = receipt_cache.get(key)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    pdf_content = render_document(
+        'receipt', transaction_id=transaction.transaction_id, generated_by=generated_by, today=today,
+    )
+    metrics.observe('receipt_pdf.render', time.perf_counter() - started)
+
+    receipt_cache.put(key, pdf_content)
+    return pdf_content
+
+
+def receipt_html(transaction, generated_by, today, image_dir=None):
+    from user_wallet import barcodes
+
+    barcode = {}
+    if getattr(settings, 'RECEIPT_BARCODE_FORMAT', 'svg') == 'svg':
+        try:
+            barcode['barcode_svg'] = barcodes.svg_markup(transaction.transaction_id)
+        except Exception:
+            logger.exception("SVG barcode failed for %s, falling back to PNG", transaction.transaction_id)
+    if not barcode:
+        barcode['barcode_base64'] = barcodes.png_base64(transaction.transaction_id)
+
+    return render_to_string('transaction_details.html', {
+        'transaction': transaction,
+        "today": today,
+        **barcode,
+        "generated_by": generated_by,
+        'IMAGE_ROOT': image_dir or image_root(),  # absolute path for images
+    })
+
+
+def statement_transactions(user, customer_id, start_date, end_date):
+    """
+    The transactions a statement for ``user`` covers, and whether it lists
+    all customers. Raises ``StatementError`` for a forbidden or empty request.
+    """
+    show_all_customers = False
+    transactions = WalletTransaction.objects.select_related("customer", "processed_by").all()
+
+    if customer_id and user.role not in AUTHORIZED_ROLES:
+        raise StatementError(
+            "You are not authorized to download statements for other customers.",
+            status.HTTP_403_FORBIDDEN,
+        )
+
+    if user.role in AUTHORIZED_ROLES:
+        if customer_id:
+            transactions = transactions.filter(customer_id=uuid.UUID(str(customer_id)))
+        else:
+            show_all_customers = True
+    else:
+        # Other users can only download their own transactions
+        transactions = transactions.filter(customer=user)
+
+    transactions = transactions.filter(
+        created_at__date__gte=start_date,
+        created_at__date__lte=end_date,
+    ).order_by('-created_at')
+    return transactions, show_all_customers
+
+
+def check_statement_size(transactions, for_job=False):
+    """
+    Count the statement's rows, raising ``StatementError`` when there are none
+    or more than the synchronous (or job) ceiling allows.
+    """
+    row_count = transactions.count()
+    if not row_count:
+        raise StatementError("No transactions found for the given filters.", status.HTTP_404_NOT_FOUND)
+
+    export_url = reverse('transaction-export')
+    if for_job:
+        limit = getattr(settings, 'STATEMENT_JOB_MAX_ROWS', 200000)
+        if row_count > limit:
+            raise StatementError(
+                f"This statement has {row_count} transactions, more than the {limit} a statement PDF can hold. "
+                f"Download them as CSV or NDJSON from {export_url} instead."
+            )
+    else:
+        limit = getattr(settings, 'STATEMENT_MAX_ROWS', 10000)
+        if row_count > limit:
+            raise StatementError(
+                f"This statement has {row_count} transactions, more than the {limit} that can be generated "
+                f"directly. Request it from {reverse('statement-jobs')} (up to "
+                f"{getattr(settings, 'STATEMENT_JOB_MAX_ROWS', 200000)} transactions) or download the rows "
+                f"from {export_url}."
+            )
+    return row_count
+
+
+STATEMENT_FIELDS = [
+    'date_of_transaction', 'transaction_id', 'transaction_type', 'payment_method', 'amount', 'cumulative_balance',
+]
+STATEMENT_RELATED_FIELDS = {
+    'customer_name': F('customer__name'),
+    'customer_phone_no': F('customer__phone_no'),
+    'processed_by_name': F('processed_by__name'),
+}
+
+
+def statement_rows(transactions):
+    """The statement table as dicts, streamed from the database."""
+    return transactions.values(*STATEMENT_FIELDS, **STATEMENT_RELATED_FIELDS).iterator(
+        chunk_size=getattr(settings, 'STATEMENT_CHUNK_ROWS', 500),
+    )
+
+
+def chunked(rows, size):
+    """Yield ``(chunk, is_last)`` lists of up to ``size`` rows."""
+    chunk = list(itertools.islice(rows, size))
+    while chunk:
+        following = list(itertools.islice(rows, size))
+        yield chunk, not following
+        chunk = following
+
+
+def render_statement(user, customer_id, start_date, end_date, admission=True, for_job=False):
+    """Return ``(pdf_bytes, filename)`` for an account statement requested by ``user``."""
+    transactions, show_all_customers = statement_transactions(user, customer_id, start_date, end_date)
+    row_count = check_statement_size(transactions, for_job=for_job)
+
+    # --- Prepare customer info ---
+    customer = transactions.values(
+        name=F('customer__name'), email=F('customer__email'), phone_no=F('customer__phone_no'),
+    ).first()
+
+    context = {
+        "customer": customer,
+        "from_date": start_date,
+        "to_date": end_date,
+        "today": date.today(),
+        "generated_by": user.name if user.id != customer.get("id") else f"{user.name} -(Self)",
+        "show_all_customers": show_all_customers,
+    }
+    guard = admission_control.admit() if admission else contextlib.nullcontext()
+    with guard:
+        pdf_content = render_statement_pdf(context, statement_rows(transactions), row_count)
+    return pdf_content, f'Account_Statement_{customer.get("name", "User")}.pdf'
+
+
+def render_statement_pdf(context, rows, row_count):
+    """
+    Render the statement as one document, or for more than
+    ``STATEMENT_CHUNK_ROWS`` rows as a run of smaller documents merged into
+    one PDF, so only one chunk's rows and layout are in memory at a time.
+    """
+    chunk_rows = getattr(settings, 'STATEMENT_CHUNK_ROWS', 500)
+    if row_count <= chunk_rows:
+        return pdf_renderer.render('statement', {'context': {**context, 'transactions': list(rows)}})
+
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    row_offset = 0
+    for chunk, is_last in chunked(rows, chunk_rows):
+        part = pdf_renderer.render('statement', {'context': {
+            **context,
+            'transactions': chunk,
+            'row_offset': row_offset,
+            'first_chunk': row_offset == 0,
+            'last_chunk': is_last,
+            'page_offset': len(writer.pages),
+        }})
+        writer.append(PdfReader(io.BytesIO(part)))
+        row_offset += len(chunk)
+        metrics.increment('statement_pdf.chunks')
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+# ----------------------------------------
+# Documents, rendered by the daemon or locally. Their arguments are plain
+# values (see pdf_renderer): records are looked up here, not passed in.
+# ----------------------------------------
+
+def receipt_pdf(transaction_id, generated_by, today):
+    if not isinstance(generated_by, str) or not isinstance(today, date):
+        raise TypeError("generated_by must be a string and today a date.")
+    transaction = WalletTransaction.objects.select_related('customer', 'processed_by').get(
+        transaction_id=str(transaction_id),
+    )
+    return write_pdf(receipt_html(transaction, generated_by, today), "CSS/transaction_receipt.css")
+
+
+def statement_pdf(context):
+    if not isinstance(context, dict):
+        raise TypeError("context must be a dict.")
+    page_offset = context.get('page_offset')
+    html_string = render_to_string("statement_templates.html", {
+        'row_offset': 0,
+        'first_chunk': True,
+        'last_chunk': True,
+        **context,
+        "IMAGE_ROOT": image_root(),
+    })
+    extra_css = None
+    if page_offset is not None:
+        # A chunk of a longer statement: carry the page number on from the
+        # previous chunks; the total isn't known yet, so no "of Y"
+        extra_css = (
+            '@page { @bottom-right { content: "Page " counter(page); } } '
+            f'@page :first {{ counter-reset: page {page_offset}; }}'
+        )
+    return write_pdf(html_string, "CSS/templates.css", extra_css=extra_css)
+
+
+DOCUMENTS = {
+    'receipt': receipt_pdf,
+    'statement': statement_pdf,
+}
+
+
+def render_document(kind, admission=True, **kwargs):
+    """
+    PDF bytes for ``DOCUMENTS[kind](**kwargs)``, from the renderer daemon if it
+    is running. Request handlers render under admission control and may get
+    ``admission.RenderingOverloaded``; background workers pass ``admission=False``.
+    """
+    if not admission:
+        return pdf_renderer.render(kind, kwargs)
+    with admission_control.admit():
+        return pdf_renderer.render(kind, kwargs)
@@ -0,0 +1,297 @@
+"""
+Local PDF renderer daemon and its client.
+
+``python manage.py run_pdf_renderer`` listens on the Unix socket
+``PDF_RENDERER_SOCKET`` with a fixed number of forked render processes,
+each holding warm WeasyPrint caches. API workers send the document kind and
+its arguments; the reply is the PDF. While the socket is missing or refuses
+connections, ``render`` renders in the calling process instead.
+
+Requests are length-prefixed JSON holding only plain values (ids, strings,
+numbers, and dates and decimals in tagged objects), never model instances:
+the daemon looks the records up itself, so a client can't make it run
+anything but the documents in ``pdf.DOCUMENTS``. The socket is also created
+mode 0600. A reply is one status byte followed by the PDF or the error.
+"""
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from user_wallet import metrics
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('!I')
+CONNECT_TIMEOUT_SECONDS = 0.5
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+OK, ERROR = b'+', b'-'
+
+
+class RendererUnavailable(Exception):
+    """The daemon is not running or dropped the connection before answering."""
+
+
+def socket_path():
+    """Configured socket path, or '' when the daemon is disabled."""
+    return str(getattr(settings, 'PDF_RENDERER_SOCKET', '') or '')
+
+
+def _send(sock, payload):
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("Connection closed mid-message.")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _recv(sock, max_size=None):
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if max_size is not None and size > max_size:
+        raise ValueError(f"Message of {size} bytes is over the {max_size} byte limit.")
+    return _recv_exact(sock, size)
+
+
+# Values JSON has no type for travel as single-key tagged objects
+DECODERS = {
+    '__datetime__': datetime.fromisoformat,
+    '__date__': date.fromisoformat,
+    '__decimal__': Decimal,
+    '__uuid__': uuid.UUID,
+}
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, uuid.UUID):
+        return {'__uuid__': str(value)}
+    raise TypeError(f"{type(value).__name__} can't be sent to the PDF renderer; pass ids and plain values.")
+
+
+def _object_hook(obj):
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in DECODERS and isinstance(value, str):
+            return DECODERS[tag](value)
+    return obj
+
+
+def encode_request(kind, kwargs):
+    return json.dumps({'kind': kind, 'kwargs': kwargs}, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def decode_request(payload):
+    """``(kind, kwargs)`` from a request, or ValueError if it isn't a document we render."""
+    from user_wallet import pdf
+
+    message = json.loads(payload, object_hook=_object_hook)
+    if not isinstance(message, dict):
+        raise ValueError("Request must be a JSON object.")
+    kind, kwargs = message.get('kind'), message.get('kwargs')
+    if kind not in pdf.DOCUMENTS:
+        raise ValueError(f"Unknown document kind {kind!r}.")
+    if not isinstance(kwargs, dict):
+        raise ValueError("Request kwargs must be a JSON object.")
+    return kind, kwargs
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError, socket.timeout) as e:
+        sock.close()
+        raise RendererUnavailable(str(e)) from e
+    return sock
+
+
+def is_running():
+    path = socket_path()
+    if not path:
+        return False
+    try:
+        _connect(path).close()
+    except RendererUnavailable:
+        return False
+    return True
+
+
+def render_remote(kind, kwargs, path=None):
+    sock = _connect(path or socket_path())
+    try:
+        sock.settimeout(getattr(settings, 'PDF_RENDERER_TIMEOUT_SECONDS', 60))
+        try:
+            _send(sock, encode_request(kind, kwargs))
+            reply = _recv(sock)
+        except ConnectionError as e:
+            # The render process died or was recycled; nothing was produced
+            raise RendererUnavailable(str(e)) from e
+    finally:
+        sock.close()
+    outcome, result = reply[:1], reply[1:]
+    if outcome != OK:
+        raise RuntimeError(f"PDF renderer failed: {result.decode('utf-8', 'replace')}")
+    return result
+
+
+def render(kind, kwargs):
+    """Render ``kind`` through the daemon, or in this process if it isn't running."""
+    if socket_path():
+        try:
+            pdf_content = render_remote(kind, kwargs)
+            metrics.increment('pdf_renderer.remote')
+            return pdf_content
+        except RendererUnavailable:
+            metrics.increment('pdf_renderer.fallbacks')
+
+    from user_wallet import pdf
+
+    metrics.increment('pdf_renderer.local')
+    return pdf.DOCUMENTS[kind](**kwargs)
+
+
+def warm_local():
+    """
+    Warm this process's PDF caches when no daemon is configured. With one
+    configured, whether it is up is only checked at the first render; a
+    fallback render loads what it needs on first use.
+    """
+    if socket_path():
+        return
+    from user_wallet import pdf
+
+    pdf.warm()
+
+
+# ----------------------------------------
+# Daemon
+# ----------------------------------------
+
+def _handle(conn):
+    from user_wallet import pdf
+
+    conn.settimeout(getattr(settings, 'PDF_RENDERER_TIMEOUT_SECONDS', 60))
+    try:
+        kind, kwargs = decode_request(_recv(conn, MAX_REQUEST_BYTES))
+        reply = OK + pdf.DOCUMENTS[kind](**kwargs)
+    except Exception as e:
+        logger.exception("PDF render failed")
+        reply = ERROR + f"{type(e).__name__}: {e}".encode('utf-8')
+    finally:
+        close_old_connections()
+    try:
+        _send(conn, reply)
+    except OSError:
+        pass  # The client timed out and went away
+
+
+def _work(listener, max_jobs):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    jobs = range(max_jobs) if max_jobs else itertools.count()
+    for _ in jobs:
+        conn, _ = listener.accept()
+        with conn:
+            _handle(conn)
+
+
+def serve(path, workers, max_jobs=0, log=None):
+    """
+    Listen on ``path`` with ``workers`` render processes until SIGTERM/SIGINT.
+
+    A process exits after ``max_jobs`` renders (0 = never) and is replaced,
+    which bounds any memory WeasyPrint accumulates.
+    """
+    from user_wallet import pdf
+
+    log = log or logger.info
+    if os.path.exists(path):
+        try:
+            _connect(path).close()
+        except RendererUnavailable:
+            os.unlink(path)  # Left over from a previous run
+        else:
+            raise RuntimeError(f"A renderer is already listening on {path}.")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(workers * 8)
+
+    # Load fonts, stylesheets and images once; the forked processes share them
+    pdf.warm()
+    connections.close_all()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _work(listener, max_jobs)
+            except BaseException:
+                logger.exception("PDF render process crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+    log(f"PDF renderer listening on {path} with {workers} processes.")
+
+    try:
+        while children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            if not stopping:
+                spawn()
+    finally:
+        listener.close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
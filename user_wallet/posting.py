@@ -0,0 +1,74 @@
+"""
+Batch posting of wallet transactions.
+
+Used by the bulk transaction endpoint: every affected wallet is locked once,
+in a deterministic order, and the rows are written with a single bulk_create.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.utils.timezone import now
+
+from user_wallet import response_cache, rollups, search, treasury
+from user_wallet.locking import lock_wallets
+from user_wallet.models import Wallet, WalletTransaction
+from user_wallet.transaction_ids import allocate_transaction_id
+
+
+def post_transaction_batch(rows, processed_by):
+    """
+    Post already validated rows and return ``(results, transactions)``.
+
+    ``rows`` is a list of ``(row_number, validated_data)`` pairs as produced by
+    ``WalletTransactionSerializer``. Rows are applied in order, so a customer's
+    ``cumulative_balance`` chain follows the order of the batch. A row that
+    would overdraw its wallet is rejected without affecting the others.
+    Must be called inside ``transaction.atomic()``, preferably through
+    ``atomic_with_retry``.
+    """
+    # Customers in wallet id order, the same for every batch
+    wallets = lock_wallets(str(data['customer'].pk) for _, data in rows)
+
+    results = OrderedDict()
+    transactions = []
+    touched = {}
+    treasury_postings = []
+    for row_number, data in rows:
+        wallet = wallets.get(str(data['customer'].pk))
+        if wallet is None:
+            results[row_number] = {'success': False, 'message': "Customer wallet not found."}
+            continue
+
+        amount = Decimal(data['amount'])
+        if data['transaction_type'] == 'deposit':
+            wallet.account_balance += amount
+            treasury_postings.append((wallet.user_id, amount))
+        else:  # withdrawal or payout
+            if wallet.account_balance < amount:
+                results[row_number] = {'success': False, 'message': "Insufficient funds for this transaction."}
+                continue
+            wallet.account_balance -= amount
+            treasury_postings.append((wallet.user_id, -amount))
+
+        txn = WalletTransaction(
+            **{**data, 'processed_by': processed_by},
+            transaction_id=allocate_transaction_id(),
+            cumulative_balance=wallet.account_balance,
+        )
+        transactions.append(txn)
+        touched[wallet.pk] = wallet
+        results[row_number] = {'success': True, 'transaction_id': txn.transaction_id}
+
+    if transactions:
+        WalletTransaction.objects.bulk_create(transactions)
+        search.index_transactions(transactions)
+        updated_at = now()
+        for wallet in touched.values():
+            wallet.updated_at = updated_at
+        Wallet.objects.bulk_update(touched.values(), ['account_balance', 'updated_at'])
+        # Treasury stripes are locked last, after every customer wallet
+        treasury.apply_deltas(treasury.deltas_for(treasury_postings))
+        rollups.record_postings(transactions)
+        response_cache.invalidate_on_commit()
+
+    return results, transactions
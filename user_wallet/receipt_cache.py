@@ -0,0 +1,166 @@
+"""
+Disk cache for single-transaction receipt PDFs.
+
+A receipt only changes when the transaction, the names printed on it, the
+print date or the template/CSS/images change, so the cache key is a hash of
+exactly those. Entries are plain files under ``RECEIPT_PDF_CACHE_DIR``; a hit
+is one file read. Files are written to a temporary name and renamed into
+place, so concurrent workers never see a partial PDF. The directory is kept
+under ``RECEIPT_PDF_CACHE_MAX_BYTES`` by evicting the least recently read
+files (hits refresh the file's mtime).
+"""
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import get_template
+
+from user_wallet import metrics
+
+
+TEMPLATE_NAME = 'transaction_details.html'
+STYLESHEET = 'CSS/transaction_receipt.css'
+
+# Evicting scans the whole directory, so only do it after this share of the
+# size budget has been written by this process
+SWEEP_FRACTION = 0.1
+
+_lock = threading.Lock()
+_written_since_sweep = 0
+
+
+def cache_dir():
+    return str(getattr(settings, 'RECEIPT_PDF_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'receipt_cache')))
+
+
+def max_bytes():
+    return getattr(settings, 'RECEIPT_PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+
+def _file_digest(path, digest):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+
+
+@functools.lru_cache(maxsize=None)
+def template_version():
+    """Hash of the receipt template, stylesheet, images and render settings (computed once per process)."""
+    from user_wallet import pdf
+
+    digest = hashlib.sha256()
+    _file_digest(get_template(TEMPLATE_NAME).origin.name, digest)
+    paths = [finders.find(STYLESHEET)]
+    paths += [os.path.join(pdf.image_root(), os.path.basename(name)) for name in pdf.PDF_IMAGES]
+    for path in paths:
+        if path and os.path.exists(path):
+            _file_digest(path, digest)
+    digest.update(repr(sorted(pdf.pdf_options().items())).encode('utf-8'))
+    digest.update(getattr(settings, 'RECEIPT_BARCODE_FORMAT', 'svg').encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def cache_key(transaction, generated_by, today):
+    processed_by = transaction.processed_by
+    parts = [
+        template_version(),
+        transaction.transaction_id,
+        transaction.updated_at.isoformat() if transaction.updated_at else '',
+        transaction.customer.name,
+        transaction.customer.email,
+        transaction.customer.phone_no or '',
+        processed_by.name if processed_by else '',
+        generated_by,
+        today.isoformat(),
+    ]
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def _path(key):
+    return os.path.join(cache_dir(), key[:2], f"{key}.pdf")
+
+
+def get(key):
+    """Return the cached PDF bytes for ``key``, or None."""
+    path = _path(key)
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        metrics.increment('receipt_cache.misses')
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # Evicted by another worker meanwhile
+    metrics.increment('receipt_cache.hits')
+    return content
+
+
+def put(key, content):
+    """Store ``content`` under ``key``; never raises for disk problems."""
+    global _written_since_sweep
+    path = _path(key)
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        metrics.increment('receipt_cache.write_errors')
+        return
+
+    with _lock:
+        _written_since_sweep += len(content)
+        sweep = _written_since_sweep >= max_bytes() * SWEEP_FRACTION
+        if sweep:
+            _written_since_sweep = 0
+    if sweep:
+        evict()
+
+
+def evict(limit=None):
+    """Delete least recently used entries until the cache is under ``limit`` bytes."""
+    limit = max_bytes() if limit is None else limit
+    entries = []
+    total = 0
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return 0
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    removed = 0
+    if total > limit:
+        entries.sort()
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # Another worker evicted it
+            total -= size
+            removed += 1
+    metrics.increment('receipt_cache.evictions', removed)
+    return removed
@@ -0,0 +1,79 @@
+"""
+Cached responses for the polled overview endpoints.
+
+Cache keys embed a generation counter stored in the cache itself. Every
+posting bumps the counter once its transaction commits, so cached entries go
+stale exactly when the data changes; the timeout is only a backstop. A
+missing counter (first start, eviction) is re-seeded from the clock, so it
+never goes back to a value that already has entries.
+
+Concurrent misses for the same key are collapsed: one request takes a short
+lock with ``cache.add`` and recomputes, the others wait for its result.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from user_wallet import metrics
+
+
+GENERATION_KEY = 'wallet:response-cache:generation'
+_POLL_SECONDS = 0.05
+
+
+def generation():
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        value = cache.get(GENERATION_KEY)
+    return value
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Not seeded yet; the next reader seeds a fresh value
+        pass
+
+
+def invalidate_on_commit():
+    """Invalidate every cached response once the current transaction commits."""
+    transaction.on_commit(bump_generation)
+
+
+def get_or_compute(name, scope, compute):
+    """
+    Return the cached value of ``name`` for ``scope`` (e.g. 'staff' or a user
+    id) in the current generation, computing it with ``compute()`` on a miss.
+    """
+    timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    key = f"wallet:response-cache:{name}:{scope}:{generation()}"
+
+    value = cache.get(key)
+    if value is not None:
+        metrics.increment('response_cache.hits')
+        return value
+    metrics.increment('response_cache.misses')
+
+    lock_timeout = getattr(settings, 'RESPONSE_CACHE_LOCK_SECONDS', 10)
+    if cache.add(f"{key}:lock", 1, timeout=lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(f"{key}:lock")
+        return value
+
+    # Another request is computing it, wait for the result
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_SECONDS)
+        value = cache.get(key)
+        if value is not None:
+            metrics.increment('response_cache.collapsed')
+            return value
+    metrics.increment('response_cache.wait_timeouts')
+    return compute()
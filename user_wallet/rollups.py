@@ -0,0 +1,275 @@
+"""
+Reporting rollups maintained on posting.
+
+``MonthlyBalance`` holds, for every customer and calendar month, the
+``cumulative_balance`` of their last transaction in that month.
+``DailySummary`` holds the amount and count of transactions per day and
+transaction type, split over the treasury stripes.
+
+Posting paths call ``record_postings`` in the posting transaction; ``rebuild``
+and ``rebuild_daily`` recompute the tables from ``WalletTransaction`` (see the
+``rebuild_monthly_balances`` and ``rebuild_daily_summaries`` commands). Days
+and months are in the project time zone.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localtime, make_aware
+
+from user_wallet import treasury
+from user_wallet.models import DailySummary, MonthlyBalance, WalletTransaction
+
+
+def month_of(moment):
+    local = localtime(moment)
+    return local.year, local.month
+
+
+def record_postings(transactions):
+    """Update the rollups for freshly posted ``transactions``."""
+    record_monthly_balances(transactions)
+    record_daily_summaries(transactions)
+
+
+def record_monthly_balances(transactions):
+    """Upsert the closing balances touched by ``transactions``."""
+    latest = {}
+    for txn in transactions:
+        key = (txn.customer_id, *month_of(txn.created_at))
+        current = latest.get(key)
+        # Postings of one customer are serialized by the wallet lock, so the
+        # newest created_at carries the closing balance
+        if current is None or txn.created_at >= current.created_at:
+            latest[key] = txn
+    if not latest:
+        return
+
+    balances = [
+        MonthlyBalance(
+            customer_id=customer_id,
+            year=year,
+            month=month,
+            closing_balance=txn.cumulative_balance,
+            last_transaction_at=txn.created_at,
+        )
+        for (customer_id, year, month), txn in latest.items()
+    ]
+    if not connection.features.supports_update_conflicts_with_target:
+        # MySQL has no ON CONFLICT (...) DO UPDATE
+        _upsert_monthly_balances(balances)
+        return
+    MonthlyBalance.objects.bulk_create(
+        balances,
+        update_conflicts=True,
+        unique_fields=['customer', 'year', 'month'],
+        update_fields=['closing_balance', 'last_transaction_at'],
+    )
+
+
+def _balance_key(balance):
+    return balance.customer_id, balance.year, balance.month
+
+
+def _upsert_monthly_balances(balances):
+    """Update the existing rows among ``balances`` and insert the rest."""
+    wanted = {_balance_key(b): b for b in balances}
+    existing = {
+        _balance_key(row): row
+        for row in MonthlyBalance.objects.select_for_update().filter(
+            customer_id__in={b.customer_id for b in balances},
+            year__in={b.year for b in balances},
+            month__in={b.month for b in balances},
+        )
+        if _balance_key(row) in wanted
+    }
+    for k, row in existing.items():
+        row.closing_balance = wanted[k].closing_balance
+        row.last_transaction_at = wanted[k].last_transaction_at
+    MonthlyBalance.objects.bulk_update(existing.values(), ['closing_balance', 'last_transaction_at'])
+
+    missing = [b for k, b in wanted.items() if k not in existing]
+    try:
+        with transaction.atomic():
+            MonthlyBalance.objects.bulk_create(missing)
+    except IntegrityError:
+        # A row was created concurrently (e.g. by a rebuild); settle them one by one
+        for b in missing:
+            MonthlyBalance.objects.update_or_create(
+                customer_id=b.customer_id, year=b.year, month=b.month,
+                defaults={'closing_balance': b.closing_balance, 'last_transaction_at': b.last_transaction_at},
+            )
+
+
+def iter_closing_balances(rows):
+    """
+    Yield one dict of ``MonthlyBalance`` fields per customer and month from
+    ``(customer_id, created_at, cumulative_balance)`` rows ordered by customer
+    and then ``created_at``. Only one customer is held in memory at a time.
+    """
+    customer = None
+    months = {}
+    for customer_id, created_at, balance in rows:
+        if customer_id != customer:
+            yield from months.values()
+            customer, months = customer_id, {}
+        year, month = month_of(created_at)
+        months[(year, month)] = {
+            'customer_id': customer_id,
+            'year': year,
+            'month': month,
+            'closing_balance': balance,
+            'last_transaction_at': created_at,
+        }
+    yield from months.values()
+
+
+def transaction_rows(queryset):
+    return (
+        queryset
+        .order_by('customer_id', 'created_at')
+        .values_list('customer_id', 'created_at', 'cumulative_balance')
+        .iterator(chunk_size=5000)
+    )
+
+
+def rebuild(year=None, batch_size=5000):
+    """Recompute ``MonthlyBalance`` (for one year, or all) and return the number of rows written."""
+    transactions = WalletTransaction.objects.all()
+    balances = MonthlyBalance.objects.all()
+    if year is not None:
+        transactions = transactions.filter(created_at__year=year)
+        balances = balances.filter(year=year)
+
+    written = 0
+    batch = []
+    with transaction.atomic():
+        balances.delete()
+        for fields in iter_closing_balances(transaction_rows(transactions)):
+            batch.append(MonthlyBalance(**fields))
+            if len(batch) >= batch_size:
+                MonthlyBalance.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            MonthlyBalance.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def monthly_totals(year, customer=None):
+    """``{month: sum of closing balances}`` for ``year``, optionally for one customer."""
+    queryset = MonthlyBalance.objects.filter(year=year)
+    if customer is not None:
+        queryset = queryset.filter(customer=customer)
+    return dict(queryset.values_list('month').annotate(total=Sum('closing_balance')).order_by())
+
+
+# ----------------------------------------
+# Daily summaries
+# ----------------------------------------
+
+def record_daily_summaries(transactions):
+    """Add ``transactions`` to their day, type and stripe rows, in key order."""
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for txn in transactions:
+        key = (localtime(txn.created_at).date(), txn.transaction_type, treasury.stripe_for(txn.customer_id))
+        deltas[key][0] += Decimal(txn.amount)
+        deltas[key][1] += 1
+
+    for (day, transaction_type, stripe) in sorted(deltas):
+        amount, count = deltas[(day, transaction_type, stripe)]
+        row = DailySummary.objects.filter(summary_date=day, transaction_type=transaction_type, stripe=stripe)
+        if row.update(total_amount=F('total_amount') + amount, transaction_count=F('transaction_count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                DailySummary.objects.create(
+                    summary_date=day, transaction_type=transaction_type, stripe=stripe,
+                    total_amount=amount, transaction_count=count,
+                )
+        except IntegrityError:
+            # Created concurrently by another posting
+            row.update(total_amount=F('total_amount') + amount, transaction_count=F('transaction_count') + count)
+
+
+def day_bounds(start, end):
+    """Aware datetimes covering the local days ``start`` to ``end`` inclusive."""
+    return make_aware(datetime.combine(start, time.min)), make_aware(datetime.combine(end + timedelta(days=1), time.min))
+
+
+def rebuild_daily(start=None, end=None):
+    """
+    Recompute ``DailySummary`` for the days ``start`` to ``end`` (inclusive,
+    both optional) and return the number of rows written. Rows are split over
+    the same stripes ``record_daily_summaries`` uses, so postings after a
+    rebuild add to them. Run it for closed days or while postings are paused.
+    """
+    transactions = WalletTransaction.objects.all()
+    summaries = DailySummary.objects.all()
+    if start is not None:
+        transactions = transactions.filter(created_at__gte=day_bounds(start, start)[0])
+        summaries = summaries.filter(summary_date__gte=start)
+    if end is not None:
+        transactions = transactions.filter(created_at__lt=day_bounds(end, end)[1])
+        summaries = summaries.filter(summary_date__lte=end)
+
+    # The stripe is a hash of the customer id, so group per customer here
+    # and fold customers into their stripes below
+    rows = (
+        transactions.annotate(day=TruncDate('created_at'))
+        .values('day', 'transaction_type', 'customer_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+        .iterator(chunk_size=5000)
+    )
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for row in rows:
+        key = (row['day'], row['transaction_type'], treasury.stripe_for(row['customer_id']))
+        totals[key][0] += row['total']
+        totals[key][1] += row['count']
+
+    with transaction.atomic():
+        summaries.delete()
+        created = DailySummary.objects.bulk_create([
+            DailySummary(
+                summary_date=day,
+                transaction_type=transaction_type,
+                stripe=stripe,
+                total_amount=amount,
+                transaction_count=count,
+            )
+            for (day, transaction_type, stripe), (amount, count) in sorted(totals.items())
+        ], batch_size=5000)
+    return len(created)
+
+
+def summarize_range(start, end):
+    """
+    ``{date: {transaction_type: {'total': Decimal, 'count': int}}}`` for the
+    days ``start`` to ``end`` inclusive, in one query. Days without postings
+    are left out.
+    """
+    rows = (
+        DailySummary.objects.filter(summary_date__range=[start, end])
+        .values('summary_date', 'transaction_type')
+        .annotate(total=Sum('total_amount'), count=Sum('transaction_count'))
+        .order_by()
+    )
+    summary = defaultdict(dict)
+    for row in rows:
+        summary[row['summary_date']][row['transaction_type']] = {'total': row['total'], 'count': row['count']}
+    return summary
+
+
+def totals_by_type(summary, start=None, end=None):
+    """Sum a ``summarize_range`` result per transaction type, optionally over a sub-range of days."""
+    totals = defaultdict(Decimal)
+    for day, types in summary.items():
+        if (start is None or day >= start) and (end is None or day <= end):
+            for transaction_type, values in types.items():
+                totals[transaction_type] += values['total']
+    return totals
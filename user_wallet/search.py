@@ -0,0 +1,94 @@
+"""
+Substring search over ``transaction_id`` and ``receipt_reference_no``.
+
+Every code is split into overlapping 3-character grams stored in
+``TransactionSearchGram``. A query of three or more characters keeps the
+transactions that have all of the query's grams (an indexed lookup), then
+confirms the match with ``icontains`` on that short candidate list. Shorter
+queries can't be split into grams and fall back to a plain ``icontains`` scan.
+
+Codes are matched case-insensitively. Transactions saved with ``save()`` are
+indexed by a post_save receiver; paths that use ``bulk_create`` must call
+``index_transactions`` themselves.
+"""
+from django.db.models import Count
+
+from user_wallet.models import TransactionSearchGram, WalletTransaction
+from user_wallet.transaction_ids import TRANSACTION_ID_PREFIX
+
+
+GRAM_SIZE = 3
+FIELDS = {
+    'transaction_id': 't',
+    'receipt_reference_no': 'r',
+}
+
+
+def normalize(value):
+    return (value or '').strip().upper()
+
+
+def grams(value):
+    value = normalize(value)
+    return {value[i:i + GRAM_SIZE] for i in range(len(value) - GRAM_SIZE + 1)}
+
+
+def index_transactions(transactions, replace=False):
+    """Write the search grams of ``transactions``; ``replace`` drops their old grams first."""
+    if replace:
+        TransactionSearchGram.objects.filter(transaction__in=[txn.pk for txn in transactions]).delete()
+    rows = [
+        TransactionSearchGram(transaction_id=txn.pk, field=code, gram=gram)
+        for txn in transactions
+        for field_name, code in FIELDS.items()
+        for gram in grams(getattr(txn, field_name))
+    ]
+    TransactionSearchGram.objects.bulk_create(rows, batch_size=5000)
+
+
+def query_grams(field_name, query):
+    wanted = grams(query)
+    if field_name == 'transaction_id' and query.startswith(TRANSACTION_ID_PREFIX) and len(wanted) > 1:
+        # Every ID starts with the prefix, so its leading gram matches a large
+        # share of rows; the icontains check still applies the full query
+        wanted.discard(query[:GRAM_SIZE])
+    return wanted
+
+
+def filter_by_code(queryset, field_name, query):
+    """Filter ``queryset`` to transactions whose ``field_name`` contains ``query``."""
+    query = normalize(query)
+    if not query:
+        return queryset
+
+    if len(query) < GRAM_SIZE:
+        # Too short for the gram index: scan, with the same substring match
+        return queryset.filter(**{f'{field_name}__icontains': query})
+
+    wanted = query_grams(field_name, query)
+    candidates = (
+        TransactionSearchGram.objects
+        .filter(field=FIELDS[field_name], gram__in=wanted)
+        .values('transaction')
+        .annotate(matched=Count('id'))
+        .filter(matched=len(wanted))
+        .values('transaction')
+    )
+    return queryset.filter(pk__in=candidates, **{f'{field_name}__icontains': query})
+
+
+def rebuild(batch_size=5000):
+    """Regenerate every search gram; returns the number of transactions indexed."""
+    TransactionSearchGram.objects.all().delete()
+    indexed = 0
+    batch = []
+    for txn in WalletTransaction.objects.only('id', 'transaction_id', 'receipt_reference_no').iterator(chunk_size=batch_size):
+        batch.append(txn)
+        if len(batch) >= batch_size:
+            index_transactions(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        index_transactions(batch)
+        indexed += len(batch)
+    return indexed
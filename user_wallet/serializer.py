@@ -4,6 +4,8 @@ from account.serializer import UserProfileSerializer
 from account.permissions import AUTHORIZED_ROLES
 from account.permissions import is_user_verified
 from account.models import User
+from decimal import Decimal
+from django.utils.timezone import is_aware, localtime
 
 
 class WalletOverviewSerializer(serializers.Serializer):
@@ -22,6 +24,82 @@ class WalletTransactionListSerializer(serializers.ModelSerializer):
     class Meta:
         model = WalletTransaction
         fields = '__all__'
+
+
+class FastWalletTransactionListSerializer:
+    """
+    Read-only stand-in for ``WalletTransactionListSerializer(many=True)``.
+    It reads ``.values()`` rows (see ``optimize_queryset``) and builds the
+    output dicts directly. The result renders to the same JSON as the DRF
+    serializer: same key order, decimals as fixed-point strings, datetimes
+    as ISO 8601 in the current time zone with ``Z`` for UTC.
+    """
+    USER_FIELDS = UserSerializer.Meta.fields
+    FIELDS = [
+        'id', 'transaction_id', 'date_of_transaction', 'transaction_type', 'payment_method',
+        'amount', 'document_photo_url', 'receipt_reference_no', 'cumulative_balance', 'comment',
+        'created_at', 'updated_at',
+    ]
+    DECIMAL_PLACES = {
+        'amount': Decimal('0.01'),
+        'cumulative_balance': Decimal('0.01'),
+    }
+
+    def __init__(self, rows, many=True):
+        self.rows = rows
+
+    @classmethod
+    def optimize_queryset(cls, queryset):
+        """Turn a transaction queryset into the ``.values()`` rows this serializer reads."""
+        return queryset.values(
+            *cls.FIELDS,
+            *[f'customer__{field}' for field in cls.USER_FIELDS],
+            *[f'processed_by__{field}' for field in cls.USER_FIELDS],
+        )
+
+    @staticmethod
+    def format_datetime(value):
+        if value is None:
+            return None
+        value = localtime(value).isoformat() if is_aware(value) else value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def format_decimal(self, value, field):
+        if value is None:
+            return None
+        return '{:f}'.format(value.quantize(self.DECIMAL_PLACES[field]))
+
+    def user(self, row, prefix):
+        if row[f'{prefix}__id'] is None:
+            return None
+        user = {field: row[f'{prefix}__{field}'] for field in self.USER_FIELDS}
+        user['id'] = str(user['id'])
+        return user
+
+    def to_representation(self, row):
+        date_of_transaction = row['date_of_transaction']
+        return {
+            'id': str(row['id']),
+            'customer': self.user(row, 'customer'),
+            'processed_by': self.user(row, 'processed_by'),
+            'transaction_id': row['transaction_id'],
+            'date_of_transaction': date_of_transaction.isoformat() if date_of_transaction else None,
+            'transaction_type': row['transaction_type'],
+            'payment_method': row['payment_method'],
+            'amount': self.format_decimal(row['amount'], 'amount'),
+            'document_photo_url': row['document_photo_url'],
+            'receipt_reference_no': row['receipt_reference_no'],
+            'cumulative_balance': self.format_decimal(row['cumulative_balance'], 'cumulative_balance'),
+            'comment': row['comment'],
+            'created_at': self.format_datetime(row['created_at']),
+            'updated_at': self.format_datetime(row['updated_at']),
+        }
+
+    @property
+    def data(self):
+        return [self.to_representation(row) for row in self.rows]
 class WalletTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = WalletTransaction
@@ -121,4 +199,11 @@ class WalletTransactionSerializer(serializers.ModelSerializer):
         user = request.user
 
         validated_data['processed_by'] = user
-        return super().create(validated_data)
\ No newline at end of file
+        wallet = validated_data.pop('wallet', None)
+        if wallet is None:
+            return super().create(validated_data)
+
+        # Running balance comes from the customer's locked wallet row
+        instance = WalletTransaction(**validated_data)
+        instance.save(wallet=wallet)
+        return instance
\ No newline at end of file
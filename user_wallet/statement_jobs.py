@@ -0,0 +1,165 @@
+"""
+Background statement PDFs.
+
+``submit`` records a ``StatementJob`` (or returns the pending/running job for
+an identical request), the ``run_statement_jobs`` command renders jobs one at
+a time per worker process and stores the PDF with Django's default storage
+(``MEDIA_ROOT`` on local disk). Run as many workers as there are cores to
+spare for rendering; each claims jobs with ``SELECT ... SKIP LOCKED`` where
+the database supports it.
+
+While a job renders, its worker refreshes ``heartbeat_at``; ``reclaim_stale``
+requeues only running jobs whose heartbeat stopped. A failed attempt goes
+back to pending with ``next_attempt_at`` pushed out exponentially.
+"""
+import contextlib
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from account.models import User
+from user_wallet import metrics, pdf
+from user_wallet.models import StatementJob
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['pending', 'running']
+
+
+def dedupe_key(user, customer_id, start_date, end_date):
+    raw = f"{user.pk}|{customer_id or '*'}|{start_date}|{end_date}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def submit(user, customer_id, start_date, end_date):
+    """Return ``(job, created)``; identical active requests share one job."""
+    key = dedupe_key(user, customer_id, start_date, end_date)
+    with transaction.atomic():
+        # The key includes the requesting user, so locking their row
+        # serializes identical requests on every backend. The partial unique
+        # constraint backs this up where it exists (MySQL ignores it).
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+        existing = StatementJob.objects.filter(dedupe_key=key, status__in=ACTIVE_STATUSES).first()
+        if existing is not None:
+            metrics.increment('statement_jobs.deduplicated')
+            return existing, False
+        job = StatementJob.objects.create(
+            requested_by=user,
+            customer_id=customer_id or None,
+            start_date=start_date,
+            end_date=end_date,
+            dedupe_key=key,
+        )
+    metrics.increment('statement_jobs.submitted')
+    return job, True
+
+
+def retry_delay(attempts):
+    """Seconds before a job that failed its ``attempts``-th attempt is tried again."""
+    return getattr(settings, 'STATEMENT_JOB_RETRY_BACKOFF_SECONDS', 30) * 2 ** max(0, attempts - 1)
+
+
+def reclaim_stale():
+    """
+    Put running jobs whose worker stopped sending heartbeats (it died) back in
+    the queue, or fail them after too many attempts. A long render keeps its
+    heartbeat fresh, so it is never taken over while still in progress.
+    """
+    cutoff = now() - timedelta(seconds=getattr(settings, 'STATEMENT_JOB_STALE_SECONDS', 180))
+    max_attempts = getattr(settings, 'STATEMENT_JOB_MAX_ATTEMPTS', 3)
+    stale = StatementJob.objects.filter(status='running', heartbeat_at__lt=cutoff)
+    stale.filter(attempts__gte=max_attempts).update(status='failed', error="Rendering worker stopped.", finished_at=now())
+    stale.filter(attempts__lt=max_attempts).update(status='pending', next_attempt_at=now())
+
+
+def claim_next():
+    """Mark the oldest pending job that is due as running and return it, or None."""
+    with transaction.atomic():
+        pending = (
+            StatementJob.objects
+            .filter(status='pending')
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now()))
+            .order_by('created_at')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        job = pending.select_related('requested_by').first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = now()
+        job.save(update_fields=['status', 'attempts', 'started_at', 'heartbeat_at'])
+    return job
+
+
+@contextlib.contextmanager
+def heartbeat(job):
+    """Refresh ``job.heartbeat_at`` from a background thread while the block runs."""
+    interval = getattr(settings, 'STATEMENT_JOB_HEARTBEAT_SECONDS', 30)
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                # Only while this attempt still owns the job
+                StatementJob.objects.filter(pk=job.pk, status='running', attempts=job.attempts).update(
+                    heartbeat_at=now(),
+                )
+        finally:
+            connection.close()  # This thread's own connection
+
+    thread = threading.Thread(target=beat, name=f"statement-job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job):
+    """Render ``job`` and record the outcome."""
+    max_attempts = getattr(settings, 'STATEMENT_JOB_MAX_ATTEMPTS', 3)
+    job.next_attempt_at = None
+    try:
+        with heartbeat(job):
+            pdf_content, filename = pdf.render_statement(
+                job.requested_by, job.customer_id, job.start_date, job.end_date, admission=False, for_job=True,
+            )
+    except pdf.StatementError as e:
+        job.status, job.error = 'failed', e.message
+    except Exception as e:
+        logger.exception(f"Statement job {job.id} failed")
+        job.error = str(e)
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = now() + timedelta(seconds=retry_delay(job.attempts))
+    else:
+        job.file_path = default_storage.save(f"statements/{job.id}.pdf", ContentFile(pdf_content))
+        job.filename = filename
+        job.status, job.error = 'done', None
+    job.finished_at = now()
+    job.save(update_fields=['status', 'error', 'file_path', 'filename', 'next_attempt_at', 'finished_at'])
+    metrics.increment(f'statement_jobs.{job.status}')
+    return job
+
+
+def purge_expired():
+    """Delete finished jobs, and their files, older than STATEMENT_JOB_TTL_SECONDS."""
+    cutoff = now() - timedelta(seconds=getattr(settings, 'STATEMENT_JOB_TTL_SECONDS', 24 * 60 * 60))
+    expired = StatementJob.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff)
+    for file_path in expired.exclude(file_path=None).values_list('file_path', flat=True):
+        default_storage.delete(file_path)
+    return expired.delete()[0]
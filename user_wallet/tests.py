@@ -1,3 +1,463 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, ProgrammingError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from account.models import User
+from user_wallet import (
+    admission, metrics, pdf, pdf_renderer, response_cache, rollups, search, statement_jobs, transaction_ids,
+)
+from user_wallet.idempotency import idempotent
+from user_wallet.locking import TransientConflict, WalletLockError, atomic_with_retry, lock_wallets
+from user_wallet.models import (
+    DailySummary, IdempotencyKey, MonthlyBalance, StatementJob, Wallet, WalletTransaction,
+)
+
+
+def make_user(name, role='customer', **extra):
+    n = User.objects.count()
+    return User.objects.create_user(
+        name=name,
+        email=f"{name.lower().replace(' ', '.')}.{n}@test.local",
+        phone_no=f"+8801700{n:06d}",
+        password='pass12345',
+        role=role,
+        is_verified=True,
+        **extra,
+    )
+
+
+class PostingTestMixin:
+    def setUp(self):
+        self.staff = make_user('Staff Member', role='employee')
+        self.customer = make_user('Customer One')
+        self.wallet = Wallet.objects.create(user=self.customer, account_balance=Decimal('0.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def deposit_payload(self, amount='100.00'):
+        return {
+            'customer': str(self.customer.id),
+            'transaction_type': 'deposit',
+            'payment_method': 'cash',
+            'amount': amount,
+            'processed_by': str(self.staff.id),
+        }
+
+    def post_deposit(self, amount='100.00', **headers):
+        return self.client.post(reverse('transaction'), self.deposit_payload(amount), format='json', headers=headers)
+
+
+@override_settings(TRANSACTION_ID_BLOCK_SIZE=2)
+class TransactionIdAllocationTests(PostingTestMixin, TransactionTestCase):
+    """Postings through the view with a fresh allocator, so blocks are reserved along the way."""
+
+    def setUp(self):
+        super().setUp()
+        transaction_ids._allocator = None
+
+    def tearDown(self):
+        transaction_ids._allocator = None
+        super().tearDown()
+
+    def test_postings_across_block_boundaries(self):
+        for _ in range(5):
+            response = self.post_deposit()
+            self.assertEqual(response.status_code, 200, response.content)
+
+        ids = list(WalletTransaction.objects.values_list('transaction_id', flat=True))
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertTrue(all(tid.startswith('TX') and len(tid) == 12 for tid in ids))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.account_balance, Decimal('500.00'))
+
+    def test_allocation_inside_a_transaction(self):
+        with transaction.atomic():
+            first = transaction_ids.allocate_transaction_id()
+            second = transaction_ids.allocate_transaction_id()
+        self.assertNotEqual(first, second)
+        # A block reserved afterwards starts past the numbers taken above
+        transaction_ids.reserve_transaction_ids(1)
+        self.assertNotIn(transaction_ids.allocate_transaction_id(), {first, second})
+
+
+class IdempotencyTests(PostingTestMixin, TransactionTestCase):
+
+    def test_repeated_key_replays_the_response(self):
+        first = self.post_deposit(Idempotency_Key='deposit-1')
+        second = self.post_deposit(Idempotency_Key='deposit-1')
+
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.headers.get('Idempotent-Replayed'), 'true')
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+        self.assertEqual(second.json()['transaction_id'], first.json()['transaction_id'])
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.account_balance, Decimal('100.00'))
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.post_deposit('100.00', Idempotency_Key='deposit-1')
+        response = self.post_deposit('250.00', Idempotency_Key='deposit-1')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+
+    def post_csv(self, amount, key):
+        payload = self.deposit_payload(amount)
+        upload = SimpleUploadedFile(
+            'batch.csv',
+            (','.join(payload) + '\n' + ','.join(payload.values()) + '\n').encode('utf-8'),
+            content_type='text/csv',
+        )
+        return self.client.post(reverse('transaction-bulk'), {'file': upload}, format='multipart',
+                                headers={'Idempotency-Key': key})
+
+    def test_upload_with_other_contents_is_rejected(self):
+        first = self.post_csv('100.00', 'batch-1')
+        replay = self.post_csv('100.00', 'batch-1')
+        changed = self.post_csv('250.00', 'batch-1')
+
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(replay.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(changed.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+
+    def test_server_errors_are_not_stored(self):
+        calls = []
+
+        class FlakyView(APIView):
+            @idempotent
+            def post(self, request):
+                calls.append(request)
+                if len(calls) == 1:
+                    return Response({'success': False}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                return Response({'success': True}, status=status.HTTP_200_OK)
+
+        factory = APIRequestFactory()
+
+        def send():
+            request = factory.post('/flaky/', {'a': 1}, format='json', headers={'Idempotency-Key': 'flaky-1'})
+            force_authenticate(request, self.staff)
+            return FlakyView.as_view()(request)
+
+        self.assertEqual(send().status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.filter(key='flaky-1').exists())
+
+        retried = send()
+        self.assertEqual(retried.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retried.headers)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(IdempotencyKey.objects.get(key='flaky-1').response_status, 200)
+
+
+@override_settings(WALLET_LOCK_RETRIES=3, WALLET_LOCK_BACKOFF_SECONDS=0)
+class LockingTests(TransactionTestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_retries_transient_errors(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return 'posted'
+
+        self.assertEqual(atomic_with_retry(flaky), 'posted')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(metrics.snapshot()['counters']['wallet_lock.retries'], 2)
+
+    def test_gives_up_after_the_last_attempt(self):
+        def locked():
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(WalletLockError):
+            atomic_with_retry(locked)
+        self.assertEqual(metrics.snapshot()['counters']['wallet_lock.retries_exhausted'], 1)
+
+    def test_other_database_errors_are_not_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise ProgrammingError("no such table")
+
+        with self.assertRaises(ProgrammingError):
+            atomic_with_retry(broken)
+        self.assertEqual(len(calls), 1)
+
+    def test_nested_block_hands_the_retry_to_the_outermost(self):
+        def locked():
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(TransientConflict):
+            with transaction.atomic():
+                atomic_with_retry(locked)
+
+    def test_lock_wallets_accepts_any_uuid_form(self):
+        wallet = Wallet.objects.create(user=make_user('Customer'))
+
+        with transaction.atomic():
+            locked = lock_wallets([wallet.user_id.hex.upper()])
+
+        self.assertEqual(locked, {str(wallet.user_id): wallet})
+
+    def test_lock_wallets_in_primary_key_order(self):
+        wallets = [Wallet.objects.create(user=make_user(f"Customer {i}")) for i in range(4)]
+        missing = User.objects.filter(wallet__isnull=True).first() or make_user('No Wallet')
+
+        with transaction.atomic():
+            locked = lock_wallets([w.user_id for w in reversed(wallets)] + [missing.id])
+
+        self.assertEqual(set(locked), {str(w.user_id) for w in wallets})
+        self.assertEqual([w.pk for w in locked.values()], sorted(w.pk for w in wallets))
+
+
+class PdfRendererProtocolTests(TestCase):
+
+    def test_plain_values_round_trip(self):
+        context = {
+            'customer': {'name': 'Alice', 'email': 'alice@example.com', 'phone_no': None},
+            'from_date': date(2026, 1, 1),
+            'today': date(2026, 1, 31),
+            'show_all_customers': False,
+            'transactions': [{
+                'date_of_transaction': datetime(2026, 1, 2, 9, 30, tzinfo=dt_timezone.utc),
+                'transaction_id': 'TX0000000001',
+                'amount': Decimal('100.50'),
+                'customer_id': uuid.UUID(int=7),
+            }],
+        }
+        kind, kwargs = pdf_renderer.decode_request(pdf_renderer.encode_request('statement', {'context': context}))
+
+        self.assertEqual(kind, 'statement')
+        self.assertEqual(kwargs, {'context': context})
+
+    def test_model_instances_are_not_sent(self):
+        with self.assertRaises(TypeError):
+            pdf_renderer.encode_request('receipt', {'transaction': make_user('Alice')})
+
+    def test_unknown_documents_are_rejected(self):
+        for payload in (b'{"kind": "os.system", "kwargs": {}}', b'{"kind": "receipt", "kwargs": []}', b'[]'):
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                pdf_renderer.decode_request(payload)
+
+
+@override_settings(TREASURY_STRIPES=4)
+class RollupTests(PostingTestMixin, TransactionTestCase):
+
+    def balance(self, customer, closing_balance, created_at):
+        return WalletTransaction(customer=customer, cumulative_balance=Decimal(closing_balance), created_at=created_at)
+
+    def check_monthly_upsert(self):
+        january = datetime(2026, 1, 10, 12, tzinfo=dt_timezone.utc)
+        rollups.record_monthly_balances([self.balance(self.customer, '10.00', january)])
+        rollups.record_monthly_balances([
+            self.balance(self.customer, '25.00', january + timedelta(days=1)),
+            self.balance(self.customer, '40.00', january + timedelta(days=31)),
+        ])
+
+        self.assertEqual(
+            sorted(MonthlyBalance.objects.values_list('month', 'closing_balance')),
+            [(1, Decimal('25.00')), (2, Decimal('40.00'))],
+        )
+
+    def test_monthly_balances_upsert(self):
+        self.check_monthly_upsert()
+
+    def test_monthly_balances_upsert_without_on_conflict(self):
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            self.check_monthly_upsert()
+
+    def test_rebuild_daily_keeps_the_stripe_layout(self):
+        for i in range(4):
+            self.customer = make_user(f"Customer {i}")
+            Wallet.objects.create(user=self.customer)
+            self.assertEqual(self.post_deposit(f"{10 * (i + 1)}.00").status_code, 200)
+        fields = ('summary_date', 'transaction_type', 'stripe', 'total_amount', 'transaction_count')
+        posted = sorted(DailySummary.objects.values_list(*fields))
+
+        rollups.rebuild_daily()
+
+        self.assertEqual(sorted(DailySummary.objects.values_list(*fields)), posted)
+        self.assertEqual(self.post_deposit('5.00').status_code, 200)
+        self.assertEqual(DailySummary.objects.count(), len(posted))
+
+
+class SearchTests(PostingTestMixin, TransactionTestCase):
+
+    def test_codes_match_anywhere(self):
+        for _ in range(3):
+            self.assertEqual(self.post_deposit().status_code, 200)
+        transaction_id = WalletTransaction.objects.first().transaction_id
+
+        for query in (transaction_id[6:8], transaction_id[5:9].lower(), transaction_id[-1]):
+            with self.subTest(query=query):
+                found = search.filter_by_code(WalletTransaction.objects.all(), 'transaction_id', query)
+                self.assertIn(transaction_id, found.values_list('transaction_id', flat=True))
+                self.assertQuerySetEqual(
+                    found.order_by('pk'),
+                    WalletTransaction.objects.filter(transaction_id__icontains=query).order_by('pk'),
+                )
+
+
+class StatementJobTests(TestCase):
+
+    def test_identical_active_requests_share_a_job(self):
+        user = make_user('Staff', role='employee')
+        start, end = date(2026, 1, 1), date(2026, 1, 31)
+
+        job, created = statement_jobs.submit(user, None, start, end)
+        again, created_again = statement_jobs.submit(user, None, start, end)
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+
+        StatementJob.objects.filter(pk=job.pk).update(status='done')
+        fresh, created_fresh = statement_jobs.submit(user, None, start, end)
+        self.assertTrue(created_fresh)
+        self.assertNotEqual(fresh.pk, job.pk)
+
+    def running_job(self, **fields):
+        job, _ = statement_jobs.submit(make_user('Staff', role='employee'), None, date(2026, 1, 1), date(2026, 1, 31))
+        StatementJob.objects.filter(pk=job.pk).update(status='running', attempts=1, **fields)
+        return job
+
+    @override_settings(STATEMENT_JOB_STALE_SECONDS=60)
+    def test_only_jobs_without_a_heartbeat_are_reclaimed(self):
+        long_running = self.running_job(started_at=now() - timedelta(hours=1), heartbeat_at=now())
+        statement_jobs.reclaim_stale()
+        self.assertEqual(StatementJob.objects.get(pk=long_running.pk).status, 'running')
+
+        StatementJob.objects.filter(pk=long_running.pk).update(heartbeat_at=now() - timedelta(minutes=2))
+        statement_jobs.reclaim_stale()
+        self.assertEqual(StatementJob.objects.get(pk=long_running.pk).status, 'pending')
+
+    @override_settings(STATEMENT_JOB_RETRY_BACKOFF_SECONDS=30)
+    def test_failed_attempt_waits_before_the_next(self):
+        job = self.running_job()
+        job.refresh_from_db()
+        with mock.patch.object(pdf, 'render_statement', side_effect=RuntimeError("renderer crashed")), \
+                self.assertLogs('user_wallet.statement_jobs', 'ERROR'):
+            statement_jobs.run(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertGreater(job.next_attempt_at, now() + timedelta(seconds=25))
+        self.assertIsNone(statement_jobs.claim_next())
+
+        StatementJob.objects.filter(pk=job.pk).update(next_attempt_at=now() - timedelta(seconds=1))
+        claimed = statement_jobs.claim_next()
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 2))
+        self.assertIsNotNone(claimed.heartbeat_at)
+
+
+class StatementJobHeartbeatTests(TransactionTestCase):
+
+    @override_settings(STATEMENT_JOB_HEARTBEAT_SECONDS=0.05)
+    def test_running_job_keeps_its_heartbeat_fresh(self):
+        job, _ = statement_jobs.submit(make_user('Staff', role='employee'), None, date(2026, 1, 1), date(2026, 1, 31))
+        job = statement_jobs.claim_next()
+        claimed_heartbeat = job.heartbeat_at
+
+        with statement_jobs.heartbeat(job):
+            time.sleep(0.3)  # Rendering
+            self.assertGreater(StatementJob.objects.get(pk=job.pk).heartbeat_at, claimed_heartbeat)
+
+
+@unittest.skipIf(admission.fcntl is None, "host slots need fcntl")
+class AdmissionTests(TestCase):
+
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        settings_override = override_settings(
+            PDF_MAX_CONCURRENT_PER_WORKER=2,
+            PDF_MAX_CONCURRENT_PER_HOST=1,
+            PDF_ADMISSION_WAIT_SECONDS=0.2,
+            PDF_ADMISSION_LOCK_DIR=self.lock_dir.name,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        admission._semaphore = None
+        self.addCleanup(setattr, admission, '_semaphore', None)
+        metrics.reset()
+
+    def hold_host_slot(self):
+        """Take the only host slot as another worker would."""
+        return admission._try_host_slot(self.lock_dir.name, 1)
+
+    def test_busy_host_rejects_after_a_short_wait(self):
+        fd = self.hold_host_slot()
+        try:
+            started = time.monotonic()
+            with self.assertRaises(admission.RenderingOverloaded), admission.admit():
+                pass
+            self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        finally:
+            os.close(fd)
+
+        with admission.admit():
+            pass
+        counters = metrics.snapshot()['counters']
+        self.assertEqual((counters['pdf_admission.rejected'], counters['pdf_admission.admitted']), (1, 1))
+        self.assertEqual(metrics.snapshot()['timings']['pdf_admission.wait']['count'], 2)
+
+    def test_slot_freed_during_the_wait_is_taken(self):
+        fd = self.hold_host_slot()
+        threading.Timer(0.05, os.close, [fd]).start()
+        with override_settings(PDF_ADMISSION_WAIT_SECONDS=2), admission.admit():
+            pass
+
+    @override_settings(PDF_MAX_CONCURRENT_PER_WORKER=1, PDF_MAX_CONCURRENT_PER_HOST=0)
+    def test_worker_slots(self):
+        with admission.admit():
+            with self.assertRaises(admission.RenderingOverloaded), admission.admit():
+                pass
+
+
+class TransactionPostingTests(PostingTestMixin, TransactionTestCase):
+
+    def test_customer_id_in_any_uuid_form(self):
+        for customer_id in (str(self.customer.id).upper(), self.customer.id.hex):
+            with self.subTest(customer_id=customer_id):
+                payload = {**self.deposit_payload('10.00'), 'customer': customer_id}
+                response = self.client.post(reverse('transaction'), payload, format='json')
+                self.assertEqual(response.status_code, 200, response.content)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.account_balance, Decimal('20.00'))
+
+
+@override_settings(TIME_ZONE='Asia/Dhaka')
+class OverviewCacheTests(PostingTestMixin, TestCase):
+
+    def test_cards_agree_on_the_local_day(self):
+        # 20:00 UTC on Jan 1 is already Jan 2 in Dhaka (UTC+6)
+        moment = datetime(2026, 1, 1, 20, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=moment), \
+                mock.patch.object(response_cache, 'get_or_compute', return_value={}) as get_or_compute:
+            for name in ('wallet-cards', 'dashboard-cards'):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+        keys = [call.args[1] for call in get_or_compute.call_args_list]
+        self.assertEqual(keys, ['staff:2026-01-02', 'staff:2026-01-02'])
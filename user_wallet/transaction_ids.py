@@ -0,0 +1,214 @@
+"""
+Allocation of ``WalletTransaction.transaction_id`` values.
+
+IDs look like ``TX`` followed by 10 base-36 characters. The default allocator
+reserves blocks of sequence numbers from the ``TransactionIdBlock`` table and
+hands them out from memory, so an insert never has to probe the table for a
+free ID. Blocks are reserved on a private connection and committed right away,
+which keeps them unique across gunicorn workers and hosts even when the
+posting transaction that triggered the reservation rolls back.
+
+SQLite locks the whole database for the duration of a write transaction, so
+there a block can't be committed on the private connection while the caller
+is inside ``atomic()``: posting views call ``reserve_transaction_ids()``
+before opening their transaction, and an allocation that still finds no
+block in hand takes a single number inside the caller's transaction instead.
+
+The allocator is pluggable through ``settings.TRANSACTION_ID_ALLOCATOR``: a
+dotted path to a class with an ``allocate()`` method returning the 10
+character code.
+"""
+import os
+import string
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.utils.module_loading import import_string
+
+
+TRANSACTION_ID_PREFIX = 'TX'
+ALPHABET = string.digits + string.ascii_uppercase
+CODE_LENGTH = 10
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+# Sequence numbers are spread over the code space with an affine bijection so
+# IDs of consecutive postings don't look sequential. The stride between them
+# is fixed, so this is cosmetic: IDs are not secret or hard to guess. The
+# multiplier must be coprime with 36.
+_MULTIPLIER = 25214903917
+_OFFSET = 1478263901537
+
+DEFAULT_ALLOCATOR = 'user_wallet.transaction_ids.BlockSequenceAllocator'
+
+
+def encode(value):
+    """Encode an integer in [0, CODE_SPACE) as a fixed width base-36 code."""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, rem = divmod(value, 36)
+        chars.append(ALPHABET[rem])
+    return ''.join(reversed(chars))
+
+
+def scramble(sequence):
+    """Map a sequence number to a unique code value (a fixed-stride permutation)."""
+    return (sequence * _MULTIPLIER + _OFFSET) % CODE_SPACE
+
+
+class BlockSequenceAllocator:
+    """
+    Hands out sequence numbers from blocks reserved in ``TransactionIdBlock``.
+
+    One database round trip per ``TRANSACTION_ID_BLOCK_SIZE`` IDs, none
+    otherwise. Thread safe, and a forked process starts with a fresh block.
+    """
+    sequence_name = 'transaction_id'
+
+    def __init__(self, block_size=None, using=DEFAULT_DB_ALIAS):
+        self.block_size = block_size or getattr(settings, 'TRANSACTION_ID_BLOCK_SIZE', 1000)
+        self.using = using
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._blocks = deque()  # [next, end) ranges, oldest first
+        # Never close a connection inherited from the parent process, the
+        # socket is shared with it.
+        self._connection = None
+
+    def allocate(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if not self._blocks:
+                if self._caller_holds_write_lock():
+                    sequence = self._reserve_in_caller_transaction()
+                else:
+                    self._blocks.append(self._reserve_block(self.block_size))
+            if self._blocks:
+                sequence = self._take()
+        if sequence >= CODE_SPACE:
+            raise OverflowError("Transaction ID sequence exhausted.")
+        return encode(scramble(sequence))
+
+    def reserve(self, count):
+        """Have at least ``count`` IDs in hand. Call outside ``atomic()``."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            missing = count - sum(end - start for start, end in self._blocks)
+            if missing > 0 and not self._caller_holds_write_lock():
+                self._blocks.append(self._reserve_block(max(self.block_size, missing)))
+
+    def _take(self):
+        start, end = self._blocks[0]
+        if start + 1 >= end:
+            self._blocks.popleft()
+        else:
+            self._blocks[0] = (start + 1, end)
+        return start
+
+    def _caller_holds_write_lock(self):
+        """True when a commit on another connection would wait for the caller's transaction."""
+        conn = connections[self.using]
+        return conn.vendor == 'sqlite' and conn.in_atomic_block
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = connections.create_connection(self.using)
+            # Request threads take turns on it under self._lock
+            self._connection.inc_thread_sharing()
+        return self._connection
+
+    def _reserve_block(self, size):
+        conn = self._get_connection()
+        try:
+            try:
+                return self._reserve_on(conn, size)
+            except IntegrityError:
+                # Another process created the sequence row first
+                return self._reserve_on(conn, size)
+        except Exception:
+            # Drop a broken connection so the next reservation reconnects
+            conn.close()
+            self._connection = None
+            raise
+
+    def _reserve_on(self, conn, size):
+        conn.set_autocommit(False)
+        try:
+            end = self._advance(conn, size)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.set_autocommit(True)
+        return end - size, end
+
+    def _reserve_in_caller_transaction(self):
+        """
+        One sequence number taken in the caller's transaction. Nothing is kept
+        in memory, since a rollback hands the number back to the table.
+        """
+        conn = connections[self.using]
+        try:
+            with transaction.atomic(using=self.using):
+                return self._advance(conn, 1) - 1
+        except IntegrityError:
+            with transaction.atomic(using=self.using):
+                return self._advance(conn, 1) - 1
+
+    def _advance(self, conn, size):
+        """Move the sequence row forward by ``size`` and return its new value."""
+        from user_wallet.models import TransactionIdBlock
+
+        table = conn.ops.quote_name(TransactionIdBlock._meta.db_table)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                [size, self.sequence_name],
+            )
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                    [self.sequence_name, size],
+                )
+                return size
+            cursor.execute(
+                f"SELECT next_value FROM {table} WHERE name = %s",
+                [self.sequence_name],
+            )
+            return cursor.fetchone()[0]
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                path = getattr(settings, 'TRANSACTION_ID_ALLOCATOR', DEFAULT_ALLOCATOR)
+                _allocator = import_string(path)()
+    return _allocator
+
+
+def allocate_transaction_id():
+    """Return a new ``TX``-prefixed transaction ID."""
+    return f"{TRANSACTION_ID_PREFIX}{get_allocator().allocate()}"
+
+
+def reserve_transaction_ids(count=1):
+    """
+    Reserve ``count`` IDs ahead of a posting transaction. Only needed where
+    the allocator can't reserve inside one (see the module docstring).
+    """
+    reserve = getattr(get_allocator(), 'reserve', None)
+    if reserve is not None:
+        reserve(count)
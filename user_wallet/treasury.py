@@ -0,0 +1,67 @@
+"""
+House (CEO) balance kept as striped sub-balances.
+
+Adding every posting to one row (the CEO wallet) would make that row lock a
+global queue. Instead each posting adjusts one ``TreasuryStripe`` chosen from
+the customer id, and readers sum the stripes. Stripe updates are
+always applied after the customer wallets are locked and in ascending stripe
+order, so they can't deadlock against each other.
+"""
+import zlib
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils.timezone import now
+
+from user_wallet.models import TreasuryStripe
+
+
+def stripe_count():
+    return max(1, getattr(settings, 'TREASURY_STRIPES', 16))
+
+
+def stripe_for(customer_id):
+    """Stable stripe number for a customer."""
+    return zlib.crc32(str(customer_id).encode()) % stripe_count()
+
+
+def apply_deltas(deltas):
+    """Add ``{stripe: Decimal}`` deltas to the treasury, in stripe order."""
+    timestamp = now()
+    for stripe in sorted(deltas):
+        delta = deltas[stripe]
+        if not delta:
+            continue
+        updated = TreasuryStripe.objects.filter(stripe=stripe).update(
+            balance=F('balance') + delta, updated_at=timestamp,
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    TreasuryStripe.objects.create(stripe=stripe, balance=delta, updated_at=timestamp)
+            except IntegrityError:
+                # Created concurrently by another posting
+                TreasuryStripe.objects.filter(stripe=stripe).update(
+                    balance=F('balance') + delta, updated_at=timestamp,
+                )
+
+
+def credit(customer_id, amount):
+    """Add ``amount`` (negative for payouts) to the customer's stripe."""
+    apply_deltas({stripe_for(customer_id): Decimal(amount)})
+
+
+def deltas_for(postings):
+    """Group ``(customer_id, signed amount)`` pairs into stripe deltas."""
+    deltas = defaultdict(Decimal)
+    for customer_id, amount in postings:
+        deltas[stripe_for(customer_id)] += amount
+    return deltas
+
+
+def house_balance():
+    """Current house balance: the sum over all stripes."""
+    return TreasuryStripe.objects.aggregate(total=Sum('balance'))['total'] or Decimal('0.00')
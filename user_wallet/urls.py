@@ -3,12 +3,18 @@ from user_wallet.views import *
 
 urlpatterns = [
     path('transaction/', TransactionAPIView.as_view(), name='transaction'),
+    path('transactions/bulk/', BulkTransactionAPIView.as_view(), name='transaction-bulk'),
     path('transaction-history/', TransactionListAPIView.as_view(), name='transaction-history'),
+    path('transactions/export/', TransactionExportAPIView.as_view(), name='transaction-export'),
     path('transaction-details/', WalletTransactionDetailAPIView.as_view(), name='transaction-detail'),
     path('dashboard-cards/', DashboardOverviewAPIView.as_view(), name='dashboard-cards'),
     path('wallet-cards/', WalletOverviewAPIView.as_view(), name='wallet-cards'),
     path('generate-statement/', GenerateStatementPdfAPIView.as_view(), name='generate-statement'),
+    path('statements/jobs/', StatementJobAPIView.as_view(), name='statement-jobs'),
+    path('statements/jobs/<uuid:job_id>/', StatementJobStatusAPIView.as_view(), name='statement-job-status'),
+    path('statements/jobs/<uuid:job_id>/download/', StatementJobDownloadAPIView.as_view(), name='statement-job-download'),
     path('generate-transaction-details/', SingleTransactionPDFView.as_view(), name='single_transaction_pdf'),
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),
 
     # path('balance/', WalletBalanceView.as_view(), name='wallet-balance'),
 
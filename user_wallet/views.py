@@ -5,35 +5,34 @@ from rest_framework import status
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
 from account.renderers import UserRenderer,UserRendererWithDecimal
-from django.db import transaction
-from user_wallet.models import Wallet,WalletTransaction
-from account.models import User
-from user_wallet.serializer import WalletTransactionSerializer,WalletTransactionListSerializer,WalletOverviewSerializer
+from user_wallet.models import Wallet,WalletTransaction,StatementJob
+from user_wallet.serializer import WalletTransactionSerializer,WalletTransactionListSerializer,WalletOverviewSerializer,FastWalletTransactionListSerializer
 from account.permissions import IsAuthorizedUser,IsNotCustomerSelf,TargetUserMustBeCustomer,AUTHORIZED_ROLES,IsUserVerifiedAndEnabled
 from decimal import Decimal
 import logging
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 import uuid
-from account.utils import send_email,generate_transaction_email_body_html,calculate_progress
-from django.utils.timezone import now, timedelta
-from django.db.models.functions import ExtractMonth
-from django.db.models import Sum
-from collections import defaultdict
-from datetime import datetime
-from django.template.loader import render_to_string
-from weasyprint import HTML, CSS
+from account.utils import queue_email,queue_emails,generate_transaction_email_body_html,calculate_progress
+from django.utils.timezone import timedelta, localdate
 from django.utils.dateparse import parse_date
-from django.http import HttpResponse
-import tempfile
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
+from django.urls import reverse
+from django.core.files.storage import default_storage
 from datetime import date
-from django.contrib.staticfiles import finders
 import io
-import base64
-from barcode import Code128            
-from barcode.writer import ImageWriter  
 from django.conf import settings
 import os
+import csv
+from user_wallet.posting import post_transaction_batch
+from user_wallet.transaction_ids import reserve_transaction_ids
+from user_wallet.pagination import TransactionCursorPagination
+from user_wallet.filters import filter_transactions
+from user_wallet import treasury, rollups, response_cache, export, pdf, statement_jobs
+from user_wallet.idempotency import idempotent
+from user_wallet.admission import RenderingOverloaded,overloaded_response
+from user_wallet.locking import TransientConflict,WalletLockError,atomic_with_retry,lock_wallets,wallet_busy_response
+from user_wallet import metrics
 
 
 
@@ -59,10 +58,10 @@ class SingleTransactionPDFView(APIView):
                     }, status=status.HTTP_400_BAD_REQUEST)
             transaction_id = request.query_params.get('transaction_id')
             # Fetch transaction object
-            transaction = WalletTransaction.objects.select_related("customer", "processed_by").get(transaction_id=transaction_id)
+            wallet_transaction = WalletTransaction.objects.select_related("customer", "processed_by").get(transaction_id=transaction_id)
 
             user = request.user
-            customer = transaction.customer
+            customer = wallet_transaction.customer
 
             if not (user.role in AUTHORIZED_ROLES or user.id == customer.id):
                 return Response({
@@ -71,40 +70,11 @@ class SingleTransactionPDFView(APIView):
                     "message": "You are not authorized to download PDF for this transaction."
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # --- Generate barcode image as Base64 --- 🔹 NEW BLOCK
-            buffer = io.BytesIO()
-            Code128(transaction.transaction_id, writer=ImageWriter()).write(buffer)
-            barcode_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            buffer.close()
-
-            # Render HTML template
-            html_string = render_to_string('transaction_details.html', {
-                'transaction': transaction,
-                "today": date.today(),
-                "barcode_base64": barcode_base64,
-                "generated_by": user.name if user.id != customer.id else f"{user.name} -(Self)",
-               'STATIC_ROOT': str(settings.STATIC_ROOT),  # pass absolute path for images
-            })
-
-            # --- Prepare CSS path ---
-            css_path = finders.find("CSS/transaction_receipt.css")
-            if not css_path:
-                raise FileNotFoundError("CSS/transaction_receipt.css not found")
-
-
-            # --- Generate PDF ---
-            html = HTML(string=html_string, base_url=str(settings.STATIC_ROOT))
-            with tempfile.NamedTemporaryFile(delete=True) as tmpfile:
-                html.write_pdf(
-                    target=tmpfile.name,
-                    stylesheets=[CSS(filename=css_path)]
-                )
-                tmpfile.seek(0)
-                pdf_content = tmpfile.read()
+            pdf_content = pdf.render_transaction_receipt(wallet_transaction, user)
 
             # --- Return PDF response ---
             response = HttpResponse(pdf_content, content_type="application/pdf")
-            response["Content-Disposition"] = f'attachment; filename="Transaction_{transaction.transaction_id}.pdf"'
+            response["Content-Disposition"] = f'attachment; filename="Transaction_{wallet_transaction.transaction_id}.pdf"'
             return response
 
         except WalletTransaction.DoesNotExist:
@@ -114,6 +84,9 @@ class SingleTransactionPDFView(APIView):
                 "message": f"Transaction with id '{transaction_id}' does not exist."
             }, status=status.HTTP_404_NOT_FOUND)
 
+        except RenderingOverloaded as e:
+            return overloaded_response(e)
+
         except Exception as e:
             return Response({
                 "success": False,
@@ -126,13 +99,11 @@ class GenerateStatementPdfAPIView(APIView):
     authentication_classes = [JWTAuthentication]
     renderer_classes = [UserRenderer]
     def get(self, request, *args, **kwargs):
-        show_all_customers = False
         try:
             user = request.user
             customer_id = request.GET.get("customer")
             start_date = request.GET.get("start_date")
             end_date = request.GET.get("end_date")
-            css_path = finders.find("CSS/statement_templates.css")
             required_fields = ['start_date', 'end_date']
             for field in required_fields:
                 if field not in request.query_params or not request.query_params[field]:
@@ -151,82 +122,83 @@ class GenerateStatementPdfAPIView(APIView):
                     'status': status.HTTP_400_BAD_REQUEST,
                     'message': 'End date cannot be before the start date.'
                 }, status=status.HTTP_400_BAD_REQUEST)
-    
 
-            # --- Build queryset based on role ---
-            transactions = WalletTransaction.objects.select_related("customer", "processed_by").all()
+            pdf_content, filename = pdf.render_statement(user, customer_id, start_date_parsed, end_date_parsed)
 
-            if customer_id:
-                if not user.role in AUTHORIZED_ROLES:
-                    return Response({
-                        "success": False,
-                        "status": status.HTTP_403_FORBIDDEN,
-                        "message": "You are not authorized to download statements for other customers."
-                    }, status=status.HTTP_403_FORBIDDEN)
-                
-            if user.role in AUTHORIZED_ROLES:
-                # Authorized user
-                if customer_id:
-                    customer_id =  uuid.UUID(customer_id)
-                    transactions = transactions.filter(customer_id=customer_id)
-                else:
-                    show_all_customers = True
-            else:
-                # Other users can only download their own transactions
-                transactions = transactions.filter(customer=user)
-            # Filter by date range
-            transactions = transactions.filter(
-                                created_at__date__gte=start_date_parsed,
-                                created_at__date__lte=end_date_parsed
-                            ).order_by('-created_at')
-
-            if not transactions.exists():
-                return Response({
-                    "success": False,
-                    "status": status.HTTP_404_NOT_FOUND,
-                    "message": "No transactions found for the given filters."
-                }, status=status.HTTP_404_NOT_FOUND)
-
-            # --- Prepare customer info ---
-            first_transaction = transactions.first()
-            customer = {
-                "name": first_transaction.customer.name,
-                "email": first_transaction.customer.email,
-                "phone_no": first_transaction.customer.phone_no,
-            }
+            # --- Return PDF response ---
+            response = HttpResponse(pdf_content, content_type="application/pdf")
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
 
-            # --- Render HTML ---
-            html_string = render_to_string("statement_templates.html", {
-                "customer": customer,
-                "transactions": transactions,
-                "from_date": start_date_parsed,
-                "to_date": end_date_parsed,
-                "today": date.today(),
-                "generated_by": user.name if user.id != customer.get("id") else f"{user.name} -(Self)",
-                "show_all_customers": show_all_customers, 
-                "STATIC_ROOT": str(settings.STATIC_ROOT),
-            })
-            
-            css_path = finders.find("CSS/templates.css")
+        except pdf.StatementError as e:
+            return Response({
+                "success": False,
+                "status": e.status_code,
+                "message": e.message
+            }, status=e.status_code)
 
-            if not css_path:
-                raise FileNotFoundError("CSS/templates.css not found in static files")
+        except RenderingOverloaded as e:
+            return overloaded_response(e)
 
+        except Exception as e:
+            return Response({
+                "success": False,
+                "status": status.HTTP_400_BAD_REQUEST,
+                "message": "Something went wrong: " + str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
 
-            html = HTML(string=html_string, base_url=str(settings.STATIC_ROOT)) 
-            # --- Generate PDF ---
-            with tempfile.NamedTemporaryFile(delete=True) as tmpfile:
-                html.write_pdf(
-                    target=tmpfile.name,
-                    stylesheets=[CSS(filename=css_path)],
-                )
-                tmpfile.seek(0)
-                pdf_content = tmpfile.read()
+class StatementJobAPIView(APIView):
+    """
+    Queue a statement PDF (same parameters as generate-statement/) and return
+    its job id right away. The PDF is rendered by run_statement_jobs.
+    """
+    permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
+    authentication_classes = [JWTAuthentication]
+    renderer_classes = [UserRenderer]
 
-            # --- Return PDF response ---
-            response = HttpResponse(pdf_content, content_type="application/pdf")
-            response["Content-Disposition"] = f'attachment; filename="Account_Statement_{customer.get("name","User")}.pdf"'
-            return response
+    def post(self, request):
+        try:
+            user = request.user
+            customer_id = request.data.get("customer")
+            required_fields = ['start_date', 'end_date']
+            for field in required_fields:
+                if not request.data.get(field):
+                    return Response({
+                        'success': False,
+                        'status': status.HTTP_400_BAD_REQUEST,
+                        'message': f'{field} is missing or empty in the request',
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+            start_date = parse_date(str(request.data.get("start_date")))
+            end_date = parse_date(str(request.data.get("end_date")))
+            if start_date is None or end_date is None:
+                raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+            if end_date < start_date:
+                return Response({
+                    'success': False,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'message': 'End date cannot be before the start date.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # Reject forbidden, empty or oversized statements before queueing anything
+            transactions, _ = pdf.statement_transactions(user, customer_id, start_date, end_date)
+            pdf.check_statement_size(transactions, for_job=True)
+            job, created = statement_jobs.submit(user, customer_id, start_date, end_date)
+
+            return Response({
+                'success': True,
+                'status': status.HTTP_202_ACCEPTED,
+                'message': "Statement queued." if created else "An identical statement is already being prepared.",
+                'data': statement_job_data(job, request),
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except pdf.StatementError as e:
+            return Response({
+                "success": False,
+                "status": e.status_code,
+                "message": e.message
+            }, status=e.status_code)
 
         except Exception as e:
             return Response({
@@ -234,7 +206,59 @@ class GenerateStatementPdfAPIView(APIView):
                 "status": status.HTTP_400_BAD_REQUEST,
                 "message": "Something went wrong: " + str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
-        
+
+
+def statement_job_data(job, request):
+    data = {
+        'job_id': job.id,
+        'status': job.status,
+        'start_date': job.start_date,
+        'end_date': job.end_date,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'error': job.error,
+        'download_url': None,
+    }
+    if job.status == 'done':
+        data['download_url'] = request.build_absolute_uri(reverse('statement-job-download', args=[job.id]))
+    return data
+
+
+class StatementJobStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
+    authentication_classes = [JWTAuthentication]
+    renderer_classes = [UserRenderer]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(StatementJob, id=job_id, requested_by=request.user)
+        return Response({
+            'success': True,
+            'status': status.HTTP_200_OK,
+            'message': f"Statement job is {job.status}.",
+            'data': statement_job_data(job, request),
+        }, status=status.HTTP_200_OK)
+
+
+class StatementJobDownloadAPIView(APIView):
+    permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
+    authentication_classes = [JWTAuthentication]
+    renderer_classes = [UserRenderer]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(StatementJob, id=job_id, requested_by=request.user)
+        if job.status != 'done' or not job.file_path or not default_storage.exists(job.file_path):
+            return Response({
+                'success': False,
+                'status': status.HTTP_409_CONFLICT,
+                'message': f"Statement is not ready (status: {job.status}).",
+            }, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            default_storage.open(job.file_path, 'rb'),
+            as_attachment=True,
+            filename=job.filename,
+            content_type="application/pdf",
+        )
+
 
 class WalletOverviewAPIView(APIView):
     permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
@@ -243,45 +267,42 @@ class WalletOverviewAPIView(APIView):
 
     def get(self, request):
         user = request.user
-        today = now().date()
+        today = localdate()
+        scope = 'staff' if user.role in AUTHORIZED_ROLES else user.pk
+
+        # Recomputed only after a posting commits or the day changes
+        data = response_cache.get_or_compute(
+            'wallet-cards', f"{scope}:{today}", lambda: self.overview_data(user, today)
+        )
+
+        return Response({
+            "success": True,
+            "status": 200,
+            "message": "Wallet overview fetched successfully.",
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+    def overview_data(self, user, today):
         current_year = today.year
         current_month = today.month
 
         # --- Step 1: Realtime balance ---
         if user.role in AUTHORIZED_ROLES:
-            ceo_user = User.objects.filter(role="CEO").first()
-            wallet = Wallet.objects.filter(user=ceo_user).first()
-            realtime_balance = wallet.account_balance if wallet else 0.0
-            tx_queryset = WalletTransaction.objects.filter(created_at__year=current_year)
+            realtime_balance = treasury.house_balance()
+            customer = None
         else:
             wallet = Wallet.objects.filter(user=user).first()
             realtime_balance = wallet.account_balance if wallet else 0.0
-            tx_queryset = WalletTransaction.objects.filter(customer=user, created_at__year=current_year)
+            customer = user
 
-        # --- Step 2: Annotate month ---
-        tx_queryset = tx_queryset.annotate(month=ExtractMonth('created_at')).order_by('customer_id', 'month', '-created_at')
+        # --- Step 2: Sum of month-end balances, from the monthly rollup ---
+        totals = rollups.monthly_totals(current_year, customer=customer)
+        monthly_transactions = [float(totals.get(m) or 0) for m in range(1, current_month + 1)]
 
-        # --- Step 3: Pick latest transaction per user per month and sum ---
-        monthly_dict = defaultdict(dict)  # {month: {customer_id: cumulative_balance}}
-        for tx in tx_queryset:
-            if tx.customer_id not in monthly_dict[tx.month]:
-                monthly_dict[tx.month][tx.customer_id] = float(tx.cumulative_balance or 0)
-
-        # --- Step 4: Sum latest balances per month ---
-        monthly_transactions = []
-        for m in range(1, current_month + 1):
-            month_sum = sum(monthly_dict[m].values()) if m in monthly_dict else 0.0
-            monthly_transactions.append(month_sum)
-
-        return Response({
-            "success": True,
-            "status": 200,
-            "message": "Wallet overview fetched successfully.",
-            "data": {
-                "realtime_balance": float(realtime_balance),
-                "monthly_transactions": monthly_transactions,
-            }
-        }, status=status.HTTP_200_OK)
+        return {
+            "realtime_balance": float(realtime_balance),
+            "monthly_transactions": monthly_transactions,
+        }
 
 class DashboardOverviewAPIView(APIView):
     permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled,IsAuthorizedUser]
@@ -289,76 +310,9 @@ class DashboardOverviewAPIView(APIView):
     renderer_classes = [UserRenderer]
     def get(self, request):
         try:
-            today = now().date()
-            seven_days_ago = today - timedelta(days=7)
-            print("seven_days_ago:", seven_days_ago)
-
-            # --- Today's totals ---
-            today_deposit_total = WalletTransaction.objects.filter(
-                transaction_type='deposit', created_at__date=today
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            today_withdraw_total = WalletTransaction.objects.filter(
-                transaction_type='withdrawal', created_at__date=today
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            today_payout_total = WalletTransaction.objects.filter(
-                transaction_type='payment_out', created_at__date=today
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            today_balance = today_deposit_total - (today_withdraw_total + today_payout_total)
-
-            # --- Last 7 days totals (excluding today) ---
-            deposit_sum_7_days = WalletTransaction.objects.filter(
-                transaction_type='deposit',
-                created_at__date__range=[seven_days_ago, today - timedelta(days=1)]
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            withdraw_sum_7_days = WalletTransaction.objects.filter(
-                transaction_type='withdrawal',
-                created_at__date__range=[seven_days_ago, today - timedelta(days=1)]
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            payout_sum_7_days = WalletTransaction.objects.filter(
-                transaction_type='payment_out',
-                created_at__date__range=[seven_days_ago, today - timedelta(days=1)]
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            balance_sum_7_days = deposit_sum_7_days - (withdraw_sum_7_days + payout_sum_7_days)
-
-            # print("today_deposit_total:", today_deposit_total)
-            # print("today_withdraw_total:", today_withdraw_total)
-            # print("today_balance:", today_balance)
-            # print("----------------------------------------")
-            # print("deposit_sum_7_days:", deposit_sum_7_days)
-            # print("withdraw_sum_7_days:", withdraw_sum_7_days)
-            # print("balance_sum_7_days:", balance_sum_7_days)
-
-            deposit_progress, deposit_percentage = calculate_progress(today_deposit_total, deposit_sum_7_days)
-            withdraw_progress, withdraw_percentage = calculate_progress(today_withdraw_total, withdraw_sum_7_days)
-            balance_progress, balance_percentage = calculate_progress(today_balance, balance_sum_7_days)
-
-            # --- Final API response ---
-            data = {
-                "deposit": {
-                    "field": "Deposit",
-                    "total_amount": float(today_deposit_total),
-                    "progress": deposit_progress,
-                    "progress_percentage": deposit_percentage
-                },
-                "withdrawal": {
-                    "field": "Withdrawal",
-                    "total_amount": float(today_withdraw_total),
-                    "progress": withdraw_progress,
-                    "progress_percentage": withdraw_percentage
-                },
-                "todays_balance": {
-                    "field": "Today’s Balance",
-                    "total_amount": float(today_balance),
-                    "progress": balance_progress,
-                    "progress_percentage": balance_percentage
-                }
-            }
+            today = localdate()
+            # Recomputed only after a posting commits or the day changes
+            data = response_cache.get_or_compute('dashboard-cards', f"staff:{today}", lambda: self.dashboard_data(today))
 
             return Response({
                 'success': True,
@@ -373,6 +327,56 @@ class DashboardOverviewAPIView(APIView):
                 'message': f"Something went wrong: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def dashboard_data(self, today):
+        seven_days_ago = today - timedelta(days=7)
+
+        # --- One range query over the daily summaries ---
+        summary = rollups.summarize_range(seven_days_ago, today)
+
+        # --- Today's totals ---
+        today_totals = rollups.totals_by_type(summary, start=today, end=today)
+        today_deposit_total = today_totals['deposit']
+        today_withdraw_total = today_totals['withdrawal']
+        today_payout_total = today_totals['payment_out']
+
+        today_balance = today_deposit_total - (today_withdraw_total + today_payout_total)
+
+        # --- Last 7 days totals (excluding today) ---
+        week_totals = rollups.totals_by_type(summary, start=seven_days_ago, end=today - timedelta(days=1))
+        deposit_sum_7_days = week_totals['deposit']
+        withdraw_sum_7_days = week_totals['withdrawal']
+        payout_sum_7_days = week_totals['payment_out']
+
+        balance_sum_7_days = deposit_sum_7_days - (withdraw_sum_7_days + payout_sum_7_days)
+
+        deposit_progress, deposit_percentage = calculate_progress(today_deposit_total, deposit_sum_7_days)
+        withdraw_progress, withdraw_percentage = calculate_progress(today_withdraw_total, withdraw_sum_7_days)
+        balance_progress, balance_percentage = calculate_progress(today_balance, balance_sum_7_days)
+
+        # --- Final API response ---
+        data = {
+            "deposit": {
+                "field": "Deposit",
+                "total_amount": float(today_deposit_total),
+                "progress": deposit_progress,
+                "progress_percentage": deposit_percentage
+            },
+            "withdrawal": {
+                "field": "Withdrawal",
+                "total_amount": float(today_withdraw_total),
+                "progress": withdraw_progress,
+                "progress_percentage": withdraw_percentage
+            },
+            "todays_balance": {
+                "field": "Today’s Balance",
+                "total_amount": float(today_balance),
+                "progress": balance_progress,
+                "progress_percentage": balance_percentage
+            }
+        }
+
+        return data
+
 
 class WalletTransactionDetailAPIView(APIView):
     permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
@@ -401,10 +405,10 @@ class WalletTransactionDetailAPIView(APIView):
         
         try:
             # Fetch transaction using transaction_id (UUID field)
-            transaction = WalletTransaction.objects.get(id=UUId)
+            wallet_transaction = WalletTransaction.objects.get(id=UUId)
 
             # ✅ Authorization check
-            if user.role not in AUTHORIZED_ROLES and transaction.customer != user:
+            if user.role not in AUTHORIZED_ROLES and wallet_transaction.customer != user:
                 return Response({
                     'success': False,
                     'status': status.HTTP_403_FORBIDDEN,
@@ -412,7 +416,7 @@ class WalletTransactionDetailAPIView(APIView):
                     'data': None
                 },status=status.HTTP_403_FORBIDDEN)
 
-            serializer = WalletTransactionListSerializer(transaction)
+            serializer = WalletTransactionListSerializer(wallet_transaction)
             return Response({
                 'success': True,
                 'status': status.HTTP_200_OK,
@@ -440,6 +444,15 @@ class TransactionListAPIView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication,IsUserVerifiedAndEnabled]
     renderer_classes = [UserRenderer]
+    # Rows are built straight from .values(); same JSON as WalletTransactionListSerializer
+    list_serializer_class = FastWalletTransactionListSerializer
+
+    def get_list_serializer(self, queryset, request, paginator):
+        serializer_class = self.list_serializer_class
+        if hasattr(serializer_class, 'optimize_queryset'):
+            queryset = serializer_class.optimize_queryset(queryset)
+        return serializer_class(paginator.paginate_queryset(queryset, request), many=True)
+
     def get(self, request):
         user = request.user
         try:
@@ -453,100 +466,32 @@ class TransactionListAPIView(APIView):
                     }, status=status.HTTP_400_BAD_REQUEST)
             # Base queryset with related customer to avoid N+1 queries
             queryset = WalletTransaction.objects.all().select_related("customer", "processed_by").order_by('-created_at')
-
-            # Query params
-            customer = request.GET.get("customer")
-            transaction_type = request.GET.get("transaction_type")
-            payment_method = request.GET.get("payment_method")
-            date_filter_type = request.GET.get("date_filter_type")
-            date_of_transaction = request.GET.get("date_of_transaction")
-            start_date = request.GET.get("start_date")
-            end_date = request.GET.get("end_date")
-            transaction_id = request.GET.get("transaction_id")
-
-            # ----------------------------------------
-            # Authorization & customer filtering
-            # ----------------------------------------
-            if user.role not in AUTHORIZED_ROLES:
-                # Non-authorized users: only their transactions
-                queryset = queryset.filter(customer=user)
-            elif customer:
-                try:
-                    customer_id = uuid.UUID(customer)
-                    queryset = queryset.filter(customer__id=customer_id)
-                except (ValueError, Exception) as e:
-                    return Response({
-                        'success': False,
-                        'status': status.HTTP_400_BAD_REQUEST,
-                        'message': "Something went wrong with customer ID filter: " + str(e)
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-            # ----------------------------------------
-            # Other filters
-            # ----------------------------------------
-            if transaction_id:
-                queryset = queryset.filter(transaction_id__icontains=transaction_id) 
-            if transaction_type:
-                queryset = queryset.filter(transaction_type__iexact=transaction_type)
-            if payment_method:
-                queryset = queryset.filter(payment_method__iexact=payment_method)
-
-            # ----------------------------------------
-            # Date filtering
-            # ----------------------------------------
-            if date_filter_type:
-                if date_filter_type not in ["single", "range"]:
-                    return Response({
-                        'success': False,
-                        'status': status.HTTP_400_BAD_REQUEST,
-                        'message': "date_filter_type must be 'single' or 'range'."
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-                if date_filter_type == "single" and date_of_transaction:
-                    try:
-                        start = datetime.strptime(date_of_transaction, "%Y-%m-%d")
-                        end = start + timedelta(days=1)
-                        queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
-                    except ValueError:
-                        return Response({
-                            'success': False,
-                            'status': status.HTTP_400_BAD_REQUEST,
-                            'message': "Invalid 'date_of_transaction'. Use YYYY-MM-DD."
-                        }, status=status.HTTP_400_BAD_REQUEST)
-
-                elif date_filter_type == "range":
-                    if not (start_date and end_date):
-                        return Response({
-                            'success': False,
-                            'status': status.HTTP_400_BAD_REQUEST,
-                            'message': "Both start_date and end_date are required for range."
-                        }, status=status.HTTP_400_BAD_REQUEST)
-
-                    try:
-                        start = datetime.strptime(start_date, "%Y-%m-%d")
-                        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-                    except ValueError:
-                        return Response({
-                            'success': False,
-                            'status': status.HTTP_400_BAD_REQUEST,
-                            'message': "Invalid date format. Use YYYY-MM-DD."
-                        }, status=status.HTTP_400_BAD_REQUEST)
-
-                    if end < start:
-                        return Response({
-                            'success': False,
-                            'status': status.HTTP_400_BAD_REQUEST,
-                            'message': "End date cannot be before start date."
-                        }, status=status.HTTP_400_BAD_REQUEST)
-
-                    queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+            # Invalid parameters raise ValueError, answered with a 400 below
+            queryset = filter_transactions(queryset, user, request.GET)
 
             # ----------------------------------------
             # Pagination
             # ----------------------------------------
+            if request.GET.get("pagination") == "cursor":
+                # Keyset pages: constant cost at any depth, no total count
+                paginator = TransactionCursorPagination()
+                serializer = self.get_list_serializer(queryset, request, paginator)
+                return Response({
+                    'success': True,
+                    'status': status.HTTP_200_OK,
+                    'message': "Transaction list fetched successfully.",
+                    'data': {
+                        'transactions_data': serializer.data,
+                        'pagination': {
+                            'page_size': paginator.page_size,
+                            'next': paginator.get_next_link(),
+                            'previous': paginator.get_previous_link(),
+                        }
+                    }
+                }, status=status.HTTP_200_OK)
+
             paginator = PageNumberPagination()
-            paginated_qs = paginator.paginate_queryset(queryset, request)
-            serializer = WalletTransactionListSerializer(paginated_qs, many=True)
+            serializer = self.get_list_serializer(queryset, request, paginator)
 
             # ----------------------------------------
             # Response
@@ -595,72 +540,68 @@ class TransactionListAPIView(APIView):
                 'message': "An unexpected error occurred. Please try again later."
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+class TransactionExportAPIView(APIView):
+    """
+    Stream every transaction matching the transaction-history filters as CSV
+    (default) or NDJSON: ?export_format=csv|ndjson. DRF reserves ?format= for
+    renderer selection, hence the different name.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated,IsUserVerifiedAndEnabled]
+    renderer_classes = [UserRenderer]
+
+    def get(self, request):
+        export_format = request.GET.get("export_format", "csv").lower()
+        if export_format not in export.FORMATS:
+            return Response({
+                'success': False,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'message': f"export_format must be one of: {', '.join(export.FORMATS)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            queryset = filter_transactions(WalletTransaction.objects.all(), request.user, request.GET)
+        except ValueError as ve:
+            return Response({
+                'success': False,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'message': str(ve)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        stream, content_type, extension = export.FORMATS[export_format]
+        chunk_size = getattr(settings, 'TRANSACTION_EXPORT_CHUNK_SIZE', 2000)
+        response = StreamingHttpResponse(stream(export.iter_rows(queryset, chunk_size)), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="transactions_{date.today()}.{extension}"'
+        return response
+
+
 class TransactionAPIView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated,IsAuthorizedUser,IsUserVerifiedAndEnabled,IsNotCustomerSelf,TargetUserMustBeCustomer]
     renderer_classes = [UserRenderer]
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Before @idempotent or atomic_with_retry opens the posting transaction
+        reserve_transaction_ids(1)
+
+    @idempotent
     def post(self, request):
         """Handles the deposit request, does not update the balance until admin approval"""
         
-        user = request.user
         custom_data = request.data.copy()
 
         try:
-            # Proceed with serializer if data is valid
-            with transaction.atomic():
-                serializer = WalletTransactionSerializer(data=custom_data, context={'request': request})
-                if serializer.is_valid():
-                    customer_id = custom_data.get('customer')
-                    ceo_wallet = Wallet.objects.select_for_update().get(user__role='CEO')
-                    wallet = Wallet.objects.select_for_update().get(user=customer_id)
-                    customer = wallet.user
-                    transaction_type = custom_data.get('transaction_type')
-
-                    if transaction_type == 'deposit':
-                        wallet.account_balance += Decimal(custom_data.get('amount', 0))
-                        ceo_wallet.account_balance += Decimal(custom_data.get('amount', 0))
-
-                    elif transaction_type in ['withdrawal', 'payment_out']:
-                        amount = Decimal(custom_data.get('amount', 0))
-                        ceo_wallet.account_balance -= amount
-                        if wallet.account_balance >= amount:
-                            wallet.account_balance -= amount
-                        else:
-                            raise ValueError("Insufficient funds for this transaction.")
-
-                    wallet.save()
-                    instance=serializer.save()
-                    ceo_wallet.save()
-                    bodyContent = generate_transaction_email_body_html(instance.transaction_id,customer.name, transaction_type, custom_data.get('amount', 0), wallet.account_balance, custom_data.get('payment_method'), custom_data.get('date_of_transaction'), user.name, user.email, user.phone_no)
-                    data={
-                        'subject': 'Transaction Confirmation Information',
-                        'body': bodyContent,
-                        'to_email': customer.email,
+            # Deadlocks and lock timeouts restart the whole block
+            return atomic_with_retry(self.place_transaction, request, custom_data)
 
-                    }
-                    
-                    send_email(data, is_html=True)
+        except TransientConflict:
+            # Retried by the enclosing atomic_with_retry (Idempotency-Key requests)
+            raise
 
-                    # logger.info(f"Transaction request placed successfully & added {custom_data.get('amount', 0)} to balance.")
-                    return Response({
-                        'success': True,
-                        'status': status.HTTP_200_OK,
-                        'transaction_id': instance.transaction_id,
-                        'message': "Transaction successfully placed."
-                    }, status=status.HTTP_200_OK)
-
-            error_messages = []
-            for field, errors in serializer.errors.items():
-                for error in errors:
-                    error_messages.append(f"{field}: {error}")
-                    
-            logger.error("\n".join(error_messages))
-            return Response({
-                "success": False,
-                "status": 400,
-                "message": "\n".join(error_messages)  # Join error messages with newline character
-            }, status=status.HTTP_400_BAD_REQUEST)
+        except WalletLockError as e:
+            logger.error(str(e))
+            return wallet_busy_response(e)
 
         except Exception as e:
             # Extract the error message if it's a ValidationError
@@ -676,3 +617,202 @@ class TransactionAPIView(APIView):
                 'status': status.HTTP_400_BAD_REQUEST,
                 'message': error_message
             }, status=status.HTTP_400_BAD_REQUEST)
+
+    def place_transaction(self, request, custom_data):
+        """One attempt at posting; runs inside atomic_with_retry and may be repeated."""
+        user = request.user
+        serializer = WalletTransactionSerializer(data=custom_data, context={'request': request})
+        if serializer.is_valid():
+            customer_id = serializer.validated_data['customer'].pk
+            wallet = lock_wallets([customer_id]).get(str(customer_id))
+            if wallet is None:
+                raise Wallet.DoesNotExist("Customer wallet not found.")
+            customer = wallet.user
+            transaction_type = custom_data.get('transaction_type')
+
+            if transaction_type == 'deposit':
+                amount = Decimal(custom_data.get('amount', 0))
+                wallet.account_balance += amount
+                treasury_delta = amount
+
+            elif transaction_type in ['withdrawal', 'payment_out']:
+                amount = Decimal(custom_data.get('amount', 0))
+                treasury_delta = -amount
+                if wallet.account_balance >= amount:
+                    wallet.account_balance -= amount
+                else:
+                    raise ValueError("Insufficient funds for this transaction.")
+
+            wallet.save()
+            instance=serializer.save(wallet=wallet)
+            # House balance lives in striped rows, not the CEO wallet
+            treasury.credit(customer.pk, treasury_delta)
+            rollups.record_postings([instance])
+            response_cache.invalidate_on_commit()
+            bodyContent = generate_transaction_email_body_html(instance.transaction_id,customer.name, transaction_type, custom_data.get('amount', 0), wallet.account_balance, custom_data.get('payment_method'), custom_data.get('date_of_transaction'), user.name, user.email, user.phone_no)
+            data={
+                'subject': 'Transaction Confirmation Information',
+                'body': bodyContent,
+                'to_email': customer.email,
+
+            }
+            
+            # Delivered by the outbox worker once this transaction commits
+            queue_email(data, is_html=True)
+
+            # logger.info(f"Transaction request placed successfully & added {custom_data.get('amount', 0)} to balance.")
+            return Response({
+                'success': True,
+                'status': status.HTTP_200_OK,
+                'transaction_id': instance.transaction_id,
+                'message': "Transaction successfully placed."
+            }, status=status.HTTP_200_OK)
+
+        error_messages = []
+        for field, errors in serializer.errors.items():
+            for error in errors:
+                error_messages.append(f"{field}: {error}")
+                
+        logger.error("\n".join(error_messages))
+        return Response({
+            "success": False,
+            "status": 400,
+            "message": "\n".join(error_messages)  # Join error messages with newline character
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BulkTransactionAPIView(APIView):
+    """
+    Post a batch of transactions (JSON list or CSV upload) in one request.
+    Every row is validated with WalletTransactionSerializer, each affected
+    wallet is locked once and the rows are written with bulk_create.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated,IsAuthorizedUser,IsUserVerifiedAndEnabled]
+    renderer_classes = [UserRenderer]
+
+    def parse_rows(self, request):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            reader = csv.DictReader(io.StringIO(upload.read().decode('utf-8-sig')))
+            # Blank CSV cells mean "not provided"
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in reader
+            ]
+
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('transactions')
+        if not isinstance(rows, list):
+            raise ValueError("Provide a JSON list of transactions, {'transactions': [...]}, or a CSV file in 'file'.")
+        return rows
+
+    @idempotent
+    def post(self, request):
+        user = request.user
+        try:
+            rows = self.parse_rows(request)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return Response({
+                'success': False,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'message': f"Invalid batch: {str(e)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_rows = getattr(settings, 'BULK_TRANSACTION_MAX_ROWS', 1000)
+        if not rows or len(rows) > max_rows:
+            return Response({
+                'success': False,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'message': f"A batch must contain between 1 and {max_rows} transactions."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # ----------------------------------------
+        # Validate every row before locking anything
+        # ----------------------------------------
+        results = {}
+        valid_rows = []
+        seen_references = set()
+        for row_number, row in enumerate(rows, start=1):
+            serializer = WalletTransactionSerializer(data=row, context={'request': request})
+            if not serializer.is_valid():
+                error_messages = []
+                for field, errors in serializer.errors.items():
+                    for error in errors:
+                        error_messages.append(f"{field}: {error}")
+                results[row_number] = {'success': False, 'message': "\n".join(error_messages)}
+                continue
+
+            data = serializer.validated_data
+            customer = data['customer']
+            reference = data.get('receipt_reference_no')
+            if customer.role != 'customer':
+                results[row_number] = {'success': False, 'message': "Only users with role 'customer' can be assigned balances."}
+            elif customer.pk == user.pk:
+                results[row_number] = {'success': False, 'message': "You are not allowed to operate on your own wallet."}
+            elif reference and reference in seen_references:
+                results[row_number] = {'success': False, 'message': "receipt_reference_no: Duplicated within this batch."}
+            else:
+                if reference:
+                    seen_references.add(reference)
+                valid_rows.append((row_number, dict(data)))
+
+        # ----------------------------------------
+        # Post the valid rows
+        # ----------------------------------------
+        transactions = []
+        if valid_rows:
+            def post_batch():
+                posted, transactions = post_transaction_batch(valid_rows, user)
+                # Confirmation emails are queued in the same transaction
+                queue_emails([{
+                    'subject': 'Transaction Confirmation Information',
+                    'body': generate_transaction_email_body_html(instance.transaction_id, instance.customer.name, instance.transaction_type, instance.amount, instance.cumulative_balance, instance.payment_method, instance.date_of_transaction, user.name, user.email, user.phone_no),
+                    'to_email': instance.customer.email,
+                } for instance in transactions], is_html=True)
+                return posted, transactions
+
+            try:
+                reserve_transaction_ids(len(valid_rows))
+                posted, transactions = atomic_with_retry(post_batch)
+                results.update(posted)
+            except TransientConflict:
+                raise
+            except WalletLockError as e:
+                logger.error(f"Bulk posting failed: {str(e)}")
+                return wallet_busy_response(e)
+            except Exception as e:
+                logger.error(f"Bulk posting failed: {str(e)}")
+                return Response({
+                    'success': False,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'message': f"Bulk posting failed: {str(e)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        posted_count = len(transactions)
+        return Response({
+            'success': posted_count > 0,
+            'status': status.HTTP_200_OK if posted_count else status.HTTP_400_BAD_REQUEST,
+            'message': f"{posted_count} of {len(rows)} transactions posted.",
+            'data': {
+                'posted': posted_count,
+                'failed': len(rows) - posted_count,
+                'results': [{'row': row_number, **results[row_number]} for row_number in sorted(results)],
+            }
+        }, status=status.HTTP_200_OK if posted_count else status.HTTP_400_BAD_REQUEST)
+
+
+class MetricsAPIView(APIView):
+    """In-process counters and timings of the worker serving the request."""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated,IsAuthorizedUser]
+    renderer_classes = [UserRenderer]
+
+    def get(self, request):
+        return Response({
+            'success': True,
+            'status': status.HTTP_200_OK,
+            'message': "Worker metrics retrieved successfully.",
+            'data': metrics.snapshot(),
+        }, status=status.HTTP_200_OK)